@@ -7,17 +7,440 @@ as work progresses.
 
 Usage:
     python3 scripts/auto-track.py track-commit [commit-hash]
+    python3 scripts/auto-track.py track-range <rev-range>
     python3 scripts/auto-track.py finalize-session
     python3 scripts/auto-track.py update-progress
 """
 
+import os
 import re
 import sys
 import json
+import tempfile
 import subprocess
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Iterator, Tuple
+
+# Commit header marker in `git log -z` output (headers and file names are NUL-separated)
+COMMIT_MARKER = "\x1e"
+
+# Rename detection as in git's defaults: 50% similarity, at most 1000 candidates per side
+RENAME_SIMILARITY = 0.5
+RENAME_LIMIT = 1000
+
+# Active [Unreleased] section: its exact heading line, then the body up to the next "## " heading
+UNRELEASED_SECTION = re.compile(
+    r"^## \[Unreleased\][ \t]*\n\n?(?P<body>.*?)(?=^## |\Z)",
+    re.MULTILINE | re.DOTALL
+)
+
+CHANGELOG_TEMPLATE = """# 📝 Changelog
+
+All notable changes to this project will be documented in this file.
+
+Format based on [Keep a Changelog](https://keepachangelog.com/ru-RU/1.0.0/).
+
+## [Unreleased]
+
+### Added
+- Initial project setup
+
+---
+
+## 🔄 History
+
+| Version | Date | Changes |
+|---------|------|---------|
+| 0.1.0 | TBD | Initial release |
+
+---
+"""
+
+
+def copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """
+    Append count bytes of src (from offset) to dst without passing them through Python.
+
+    Uses copy_file_range (which can share extents on reflink filesystems),
+    then sendfile, then plain reads as a last resort.
+    """
+
+    end = offset + count
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            while offset < end:
+                copied = os.copy_file_range(src_fd, dst_fd, end - offset, offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError:
+            pass  # e.g. EXDEV/ENOSYS: fall back below
+
+    if hasattr(os, "sendfile"):
+        try:
+            while offset < end:
+                sent = os.sendfile(dst_fd, src_fd, offset, end - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError:
+            pass
+
+    while offset < end:
+        chunk = os.pread(src_fd, min(end - offset, 1 << 20), offset)
+        if not chunk:
+            break
+        os.write(dst_fd, chunk)
+        offset += len(chunk)
+
+
+class GitReader:
+    """
+    Git access through one long-lived `git cat-file --batch` process.
+
+    Revisions (HEAD, HEAD~10, sha prefixes, branch names) are resolved by
+    cat-file itself and commits and trees are parsed here, so commit info
+    and changed-file lists cost no extra process spawns. Ranges are left to
+    one `git rev-list`, which walks history exactly as git log does.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.process = None
+        self.commits: Dict[str, Dict] = {}
+
+    def read(self, rev: str) -> Optional[Tuple[str, str, bytes]]:
+        """Read an object: (sha, type, content), or None if it does not exist"""
+
+        if self.process is None:
+            self.process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.root
+            )
+
+        try:
+            self.process.stdin.write(rev.encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            return None  # Not a git repository
+
+        header = self.process.stdout.readline().split()
+        if len(header) != 3:
+            return None  # "<rev> missing", "<rev> ambiguous" or EOF
+
+        sha, kind, size = header[0].decode(), header[1].decode(), int(header[2])
+        content = self.process.stdout.read(size + 1)[:size]
+        return sha, kind, content
+
+    def commit(self, rev: str) -> Optional[Dict]:
+        """Parse a commit (tree, parents, author, dates, message)"""
+
+        if rev in self.commits:
+            return self.commits[rev]
+
+        obj = self.read(f"{rev}^{{commit}}")
+        if obj is None:
+            return None
+
+        sha, _, content = obj
+        if sha in self.commits:
+            return self.commits[sha]
+
+        headers, _, message = content.decode("utf-8", "replace").partition("\n\n")
+        commit = {"hash": sha, "tree": "", "parents": [], "message": message}
+        for line in headers.split("\n"):
+            key, _, value = line.partition(" ")
+            if key == "tree":
+                commit["tree"] = value
+            elif key == "parent":
+                commit["parents"].append(value)
+            elif key in ("author", "committer"):
+                name, _, stamp = value.rpartition("> ")
+                seconds, _, tz = stamp.partition(" ")
+                commit[key] = name.split(" <")[0]
+                commit[f"{key}_time"] = int(seconds)
+                commit[f"{key}_tz"] = tz
+
+        self.commits[sha] = commit
+        return commit
+
+    def tree(self, sha: str) -> Dict[str, Tuple[str, str]]:
+        """Parse a tree: {name: (mode, sha)}, in git's order"""
+
+        obj = self.read(sha)
+        if obj is None:
+            return {}
+
+        entries = {}
+        content, pos = obj[2], 0
+        while pos < len(content):
+            space = content.index(b" ", pos)
+            nul = content.index(b"\0", space)
+            mode = content[pos:space].decode()
+            name = content[space + 1:nul].decode("utf-8", "surrogateescape")
+            entries[name] = (mode, content[nul + 1:nul + 21].hex())
+            pos = nul + 21
+        return entries
+
+    def diff_trees(self, old: Optional[str], new: Optional[str]) -> List[str]:
+        """
+        Paths of files that differ between two trees (identical subtrees are skipped)
+
+        Renames are listed once, under their new path, like git's default
+        rename detection: a deleted and an added file pair up when they hold
+        the same blob or at least RENAME_SIMILARITY of the same content.
+        Similarity is scored like git's (matching line chunks against the
+        larger file), so borderline pairs may rarely be judged differently.
+        """
+
+        changes = []
+        self._diff_entries(old, new, "", changes)
+
+        deleted = {path: blob for path, blob, new_blob in changes if new_blob is None}
+        added = {path: blob for path, old_blob, blob in changes if old_blob is None}
+        renamed = set()
+
+        # Exact renames first: the same blob under a new path
+        by_blob: Dict[str, List[str]] = {}
+        for path, blob in added.items():
+            by_blob.setdefault(blob, []).append(path)
+        for path, blob in deleted.items():
+            if by_blob.get(blob):
+                added.pop(by_blob[blob].pop(0))
+                renamed.add(path)
+
+        sources = {path: blob for path, blob in deleted.items() if path not in renamed}
+        if sources and added and len(sources) * len(added) <= RENAME_LIMIT ** 2:
+            renamed.update(self._inexact_renames(sources, added))
+
+        return [path for path, _, _ in changes if path not in renamed]
+
+    def _inexact_renames(self, sources: Dict[str, str], targets: Dict[str, str]) -> List[str]:
+        """Deleted paths that pair with an added path, best scores first"""
+
+        chunks = {blob: self._chunks(blob) for blob in {*sources.values(), *targets.values()}}
+        pairs = []
+        for source, source_blob in sources.items():
+            source_size, source_chunks = chunks[source_blob]
+            for target, target_blob in targets.items():
+                target_size, target_chunks = chunks[target_blob]
+                largest = max(source_size, target_size)
+                if not largest or abs(source_size - target_size) > largest * (1 - RENAME_SIMILARITY):
+                    continue
+                copied = sum(min(size, target_chunks[chunk])
+                             for chunk, size in source_chunks.items() if chunk in target_chunks)
+                score = copied / largest
+                if score >= RENAME_SIMILARITY:
+                    pairs.append((-score, target, source))
+
+        used_targets, renamed = set(), []
+        for _, target, source in sorted(pairs):
+            if target not in used_targets and source not in renamed:
+                used_targets.add(target)
+                renamed.append(source)
+        return renamed
+
+    def _chunks(self, blob: str) -> Tuple[int, Dict[bytes, int]]:
+        """Blob size and bytes per chunk (lines of at most 64 bytes, CRLF as LF), as git scores similarity"""
+
+        obj = self.read(blob)
+        data = obj[2].replace(b"\r\n", b"\n") if obj else b""
+        counts: Dict[bytes, int] = {}
+        for line in data.splitlines(keepends=True):
+            for pos in range(0, len(line), 64):
+                chunk = line[pos:pos + 64]
+                counts[chunk] = counts.get(chunk, 0) + len(chunk)
+        return len(data), counts
+
+    def _diff_entries(self, old: Optional[str], new: Optional[str], prefix: str,
+                      changes: List[Tuple[str, Optional[str], Optional[str]]]):
+        """Collect (path, old blob, new blob) for every file that differs, in git's path order"""
+
+        if old == new:
+            return
+
+        old_entries = self.tree(old) if old else {}
+        new_entries = self.tree(new) if new else {}
+
+        for name in sorted(old_entries.keys() | new_entries.keys(),
+                           key=lambda n: n + "/" if (new_entries.get(n) or old_entries[n])[0] == "40000" else n):
+            old_entry, new_entry = old_entries.get(name), new_entries.get(name)
+            if old_entry == new_entry:
+                continue
+
+            old_tree = old_entry[1] if old_entry and old_entry[0] == "40000" else None
+            new_tree = new_entry[1] if new_entry and new_entry[0] == "40000" else None
+            if old_tree or new_tree:
+                self._diff_entries(old_tree, new_tree, f"{prefix}{name}/", changes)
+
+            old_blob = old_entry[1] if old_entry and not old_tree else None
+            new_blob = new_entry[1] if new_entry and not new_tree else None
+            if old_blob or new_blob:
+                changes.append((f"{prefix}{name}", old_blob, new_blob))
+
+    def changed_files(self, commit: Dict) -> List[str]:
+        """Files changed by a commit; for merges, files that differ from every parent"""
+
+        if not commit["parents"]:
+            return self.diff_trees(None, commit["tree"])
+
+        changed = None
+        for parent in commit["parents"]:
+            files = self.diff_trees(self.commit(parent)["tree"], commit["tree"])
+            if changed is None:
+                changed = files
+            else:
+                files = set(files)
+                changed = [f for f in changed if f in files]
+        return changed
+
+    def rev_list(self, rev_range: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Commit hashes of a range, newest first, from one `git rev-list` process.
+
+        git resolves the range and stops after limit commits itself; only
+        the objects are read through cat-file.
+        """
+
+        args = ["git", "rev-list"]
+        if limit is not None:
+            args.append(f"--max-count={limit}")
+        result = subprocess.run(args + [rev_range, "--"], capture_output=True, cwd=self.root)
+        if result.returncode != 0:
+            stderr = result.stderr.decode("utf-8", "replace").strip()
+            raise RuntimeError(f"git rev-list {rev_range} failed: {stderr}")
+        return result.stdout.decode().split()
+
+    def log(self, rev_range: str, limit: Optional[int] = None) -> List[Dict]:
+        """Parsed commits of a range (anything git rev-list accepts), newest first"""
+
+        return [self.commit(sha) for sha in self.rev_list(rev_range, limit)]
+
+    @staticmethod
+    def subject(message: str) -> str:
+        """Subject of a commit message like git's %s: the first paragraph joined into one line"""
+
+        lines = message.lstrip("\n").split("\n")
+        subject = []
+        for line in lines:
+            if not line.strip():
+                break
+            subject.append(line.rstrip())
+        return " ".join(subject)
+
+    def close(self):
+        """Stop the cat-file process"""
+
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.stdout.close()
+            self.process.wait()
+            self.process = None
+
+    @staticmethod
+    def format_date(seconds: int, tz: str) -> str:
+        """Format a commit timestamp like `git log --date=iso`"""
+
+        sign = -1 if tz.startswith("-") else 1
+        offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5])) * sign
+        moment = datetime.fromtimestamp(seconds, timezone(offset))
+        return f"{moment.strftime('%Y-%m-%d %H:%M:%S')} {tz}"
+
+
+class TasksDocument:
+    """
+    TASKS.md parsed in one pass into phases, task counts and progress lines.
+
+    Spans are character offsets into the text. Progress for the whole file
+    and for every phase is counted during the scan, and render() re-emits
+    only the spans whose text changes.
+    """
+
+    PATTERN = re.compile(
+        r"(?P<phase>## 🎯 Фаза (?P<number>\d+|\\#): (?P<name>.+?) \| .+? \| \d+%)"
+        r"|(?P<boundary>## 🎯 Фаза)"
+        r"|(?P<task>### (?P<id>[\w-]*)(?P<colon>:?))"
+        r"|(?P<progress>\*\*Общий Прогресс:\*\*\s*\d+%)"
+        r"|(?P<done>✅ ВЫПОЛНЕНО)"
+    )
+    TRACKED_TASK = re.compile(r"(?:TASK|INIT|PRJ|PHASE)-[\d:]")
+
+    def __init__(self, content: str):
+        self.content = content
+        self.phases: List[Dict] = []
+        self.progress_spans: List[Tuple[int, int]] = []
+        self.total_tasks = 0
+        self.completed = 0
+
+        phase = None
+        for match in self.PATTERN.finditer(content):
+            if match.group("phase"):
+                done = match.group("phase").count("✅ ВЫПОЛНЕНО")
+                phase = {
+                    "number": match.group("number"),
+                    "name": match.group("name"),
+                    "span": match.span("phase"),
+                    "tasks": 0,
+                    "completed": done
+                }
+                self.phases.append(phase)
+                self.completed += done
+            elif match.group("boundary"):
+                phase = None
+            elif match.group("task") is not None:
+                if match.group("id") and match.group("colon") and phase:
+                    phase["tasks"] += 1
+                if self.TRACKED_TASK.match(content, match.start("id")):
+                    self.total_tasks += 1
+            elif match.group("progress"):
+                self.progress_spans.append(match.span())
+            else:
+                self.completed += 1
+                if phase:
+                    phase["completed"] += 1
+
+    @property
+    def progress(self) -> int:
+        """Overall progress percentage"""
+
+        return int((self.completed / self.total_tasks * 100)) if self.total_tasks > 0 else 0
+
+    def progress_edits(self) -> List[Tuple[Tuple[int, int], str]]:
+        """Replacements for every overall progress line"""
+
+        line = f"**Общий Прогресс:** {self.progress}%"
+        return [(span, line) for span in self.progress_spans]
+
+    def phase_edits(self) -> List[Tuple[Tuple[int, int], str]]:
+        """Replacements for every phase progress bar"""
+
+        edits = []
+        for index, phase in enumerate(self.phases, 1):
+            progress = int((phase["completed"] / phase["tasks"] * 100)) if phase["tasks"] > 0 else 0
+            state = "✅ Завершена" if progress == 100 else "🔄 В работе"
+            # Headers broken by earlier versions ("Фаза \#") get their position back
+            number = index if phase["number"] == "\\#" else phase["number"]
+            edits.append((phase["span"], f"## 🎯 Фаза {number}: {phase['name']} | {state} | {progress}%"))
+        return edits
+
+    def render(self, edits: List[Tuple[Tuple[int, int], str]]) -> str:
+        """Text with the given span replacements applied"""
+
+        parts, pos = [], 0
+        for (start, end), text in sorted(edits):
+            if self.content[start:end] != text:
+                parts += [self.content[pos:start], text]
+                pos = end
+
+        if not parts:
+            return self.content
+        parts.append(self.content[pos:])
+        return "".join(parts)
 
 
 class DocumentationTracker:
@@ -30,6 +453,8 @@ class DocumentationTracker:
         self.changelog_path = self.root / "CHANGELOG.md"
         self.tracking_dir = self.root / ".tracking"
         self.state_file = self.tracking_dir / "session_state.json"
+        self.changelog_index = self.tracking_dir / "changelog_index.json"
+        self.git = GitReader(self.root)
 
         # Ensure tracking dir exists
         self.tracking_dir.mkdir(exist_ok=True)
@@ -61,42 +486,112 @@ class DocumentationTracker:
 
         return updates
 
-    def get_commit_info(self, commit_hash: str = "HEAD") -> Dict:
-        """Get detailed commit info from git"""
+    def track_range(self, rev_range: str) -> Dict:
+        """
+        Track every commit in a revision range with one git process.
 
-        # Get commit details
-        result = subprocess.run(
-            ["git", "show", "--format=%H%n%s%n%an%n%ad", "--date=iso", commit_hash],
-            capture_output=True,
-            text=True,
-            cwd=self.root
-        )
+        Commits are streamed oldest first from iter_commits(); task updates
+        are applied to the in-memory TASKS.md and changelog entries are
+        spliced in one batch, so each document is written at most once.
+        """
 
-        if result.returncode != 0:
-            return {"hash": "unknown", "message": "", "author": "", "date": ""}
+        tasks = self.tasks_path.read_text() if self.tasks_path.exists() else None
+        changelog_commits = []
+
+        updates = {
+            "commits": 0,
+            "tasks_updated": 0,
+            "changelog_entries": 0
+        }
+        last_commit = None
 
-        lines = result.stdout.split("\n")
+        for commit in self.iter_commits(rev_range):
+            updates["commits"] += 1
+            last_commit = commit
 
-        # Get changed files
-        files_result = subprocess.run(
-            ["git", "show", "--name-only", "--format=", commit_hash],
-            capture_output=True,
-            text=True,
+            if tasks is not None and (task_id := self.extract_task_id(commit["message"])):
+                if (new_tasks := self.apply_task_update(tasks, task_id, commit)) is not None:
+                    tasks = new_tasks
+                    updates["tasks_updated"] += 1
+
+            if self.should_add_to_changelog(commit):
+                changelog_commits.append(commit)
+
+        if updates["tasks_updated"]:
+            self.tasks_path.write_text(self.recalculate_progress(tasks))
+        if changelog_commits:
+            updates["changelog_entries"] = self.add_changelog_entries(changelog_commits)
+        if last_commit:
+            self.save_state(last_commit)
+
+        return updates
+
+    def iter_commits(self, rev_range: str) -> Iterator[Dict]:
+        """Stream commits (oldest first) with changed files from a single `git log -z`"""
+
+        process = subprocess.Popen(
+            ["git", "log", "--reverse", "-z", "--name-only", "--cc", "--date=iso",
+             f"--format={COMMIT_MARKER}%H%n%s%n%an%n%ad", rev_range, "--"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             cwd=self.root
         )
 
-        files_changed = []
-        if files_result.returncode == 0 and files_result.stdout.strip():
-            files_changed = [
-                f for f in files_result.stdout.strip().split("\n")
-                if f and not f.startswith(".tracking/")
-            ]
+        commit = None
+        pending = b""
+        try:
+            while chunk := process.stdout.read(65536):
+                *fields, pending = (pending + chunk).split(b"\0")
+                for field in fields:
+                    # File lists start on a new line after the header
+                    value = field.decode("utf-8", "surrogateescape").lstrip("\n")
+                    if value.startswith(COMMIT_MARKER):
+                        if commit:
+                            yield commit
+                        lines = value[len(COMMIT_MARKER):].split("\n")
+                        commit = {
+                            "hash": lines[0],
+                            "message": lines[1] if len(lines) > 1 else "",
+                            "author": lines[2] if len(lines) > 2 else "",
+                            "date": lines[3] if len(lines) > 3 else "",
+                            "files_changed": []
+                        }
+                    elif commit and value and not value.startswith(".tracking/"):
+                        commit["files_changed"].append(value)
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode("utf-8", "replace")
+            process.stderr.close()
+            returncode = process.wait()
+
+        if returncode != 0:
+            raise RuntimeError(f"git log {rev_range} failed: {stderr.strip()}")
+        if commit:
+            yield commit
+
+    def get_commit_info(self, commit_hash: str = "HEAD") -> Dict:
+        """Get detailed commit info from git"""
+
+        commit = self.git.commit(commit_hash)
+
+        if commit is None:
+            return {"hash": "unknown", "message": "", "author": "", "date": "", "files_changed": []}
+
+        return self.commit_info(commit)
+
+    def commit_info(self, commit: Dict) -> Dict:
+        """Commit info dict (subject, author, ISO date, changed files) from a parsed commit"""
+
+        files_changed = [
+            f for f in self.git.changed_files(commit)
+            if not f.startswith(".tracking/")
+        ]
 
         return {
-            "hash": lines[0] if len(lines) > 0 else "",
-            "message": lines[1] if len(lines) > 1 else "",
-            "author": lines[2] if len(lines) > 2 else "",
-            "date": lines[3] if len(lines) > 3 else "",
+            "hash": commit["hash"],
+            "message": GitReader.subject(commit["message"]),
+            "author": commit["author"],
+            "date": GitReader.format_date(commit["author_time"], commit["author_tz"]),
             "files_changed": files_changed
         }
 
@@ -124,11 +619,25 @@ class DocumentationTracker:
 
         content = self.tasks_path.read_text()
 
+        new_content = self.apply_task_update(content, task_id, commit)
+
+        if new_content is None:
+            return False  # Task not found
+
+        # Recalculate progress
+        new_content = self.recalculate_progress(new_content)
+
+        self.tasks_path.write_text(new_content)
+        return True
+
+    def apply_task_update(self, content: str, task_id: str, commit: Dict) -> Optional[str]:
+        """Apply a commit to TASKS.md content; None if the task is not there"""
+
         # Find task section
         task_pattern = rf"### {re.escape(task_id)}:"
 
         if not re.search(task_pattern, content):
-            return False  # Task not found
+            return None
 
         # Determine status from commit message
         status = self.determine_task_status(commit["message"])
@@ -143,11 +652,7 @@ class DocumentationTracker:
             # Add completion info
             new_content = self.add_completion_info(new_content, task_id, commit)
 
-        # Recalculate progress
-        new_content = self.recalculate_progress(new_content)
-
-        self.tasks_path.write_text(new_content)
-        return True
+        return new_content
 
     def determine_task_status(self, message: str) -> str:
         """Determine task status from commit message"""
@@ -210,56 +715,16 @@ class DocumentationTracker:
         return content.replace(section_text, new_section)
 
     def recalculate_progress(self, content: str) -> str:
-        """Recalculate overall progress percentage"""
-
-        # Count total and completed tasks
-        all_tasks = len(re.findall(r"### (?:TASK|INIT|PRJ|PHASE)-[\d:]+", content))
-        completed = len(re.findall(r"✅ ВЫПОЛНЕНО", content))
-
-        progress = int((completed / all_tasks * 100)) if all_tasks > 0 else 0
+        """Recalculate overall progress percentage and phase progress bars"""
 
-        # Update progress line
-        progress_pattern = r"\*\*Общий Прогресс:\*\*\s*\d+%"
-        progress_line = f"**Общий Прогресс:** {progress}%"
-
-        new_content = re.sub(progress_pattern, progress_line, content)
-
-        # Also update phase progress bars
-        new_content = self.update_phase_progress(new_content)
-
-        return new_content
+        document = TasksDocument(content)
+        return document.render(document.progress_edits() + document.phase_edits())
 
     def update_phase_progress(self, content: str) -> str:
         """Update individual phase progress bars"""
 
-        phases = re.findall(r"## 🎯 Фаза \d+: (.+?) \| (.+?) \| (\d+)%", content)
-
-        for phase_name, _, _ in phases:
-            # Find phase section
-            phase_section = re.search(
-                rf"## 🎯 Фаза \d+: {re.escape(phase_name)}.*?(?=## 🎯 Фаза|\Z)",
-                content,
-                re.DOTALL
-            )
-
-            if not phase_section:
-                continue
-
-            section_text = phase_section.group(0)
-
-            # Count tasks in phase
-            phase_tasks = len(re.findall(r"### [\w-]+:", section_text))
-            phase_completed = len(re.findall(r"✅ ВЫПОЛНЕНО", section_text))
-
-            phase_progress = int((phase_completed / phase_tasks * 100)) if phase_tasks > 0 else 0
-
-            # Update progress bar
-            old_bar = rf"## 🎯 Фаза \d+: {re.escape(phase_name)} \| (.+?) \| \d+%"
-            new_bar = f"## 🎯 Фаза \\#: {phase_name} | {'✅ Завершена' if phase_progress == 100 else '🔄 В работе'} | {phase_progress}%"
-
-            content = re.sub(old_bar, new_bar, content)
-
-        return content
+        document = TasksDocument(content)
+        return document.render(document.phase_edits())
 
     def should_add_to_changelog(self, commit: Dict) -> bool:
         """Determine if commit should be in CHANGELOG"""
@@ -285,10 +750,121 @@ class DocumentationTracker:
     def add_changelog_entry(self, commit: Dict) -> None:
         """Add entry to CHANGELOG.md"""
 
-        if not self.changelog_path.exists():
-            self.create_changelog()
+        self.add_changelog_entries([commit])
+
+    def add_changelog_entries(self, commits: List[Dict]) -> int:
+        """
+        Splice entries for several commits into CHANGELOG.md in one pass.
+
+        Only the head of the file (up to the end of the [Unreleased] section,
+        located through the sidecar index) is read and rewritten. The tail is
+        copied into the new file by the kernel and never parsed. Files have
+        no insert-in-place operation, so the tail is still copied once, but
+        its I/O no longer goes through Python. CRLF files keep their line
+        endings. Returns the number of entries added.
+        """
+
+        exists = self.changelog_path.exists()
+        if exists:
+            head_end = self.changelog_head_end()
+            with open(self.changelog_path, "rb") as f:
+                head = f.read(head_end).decode("utf-8")
+        else:
+            head_end, head = 0, CHANGELOG_TEMPLATE
+
+        newline = "\r\n" if "\r\n" in head else "\n"
+        head = head.replace("\r\n", "\n")
 
-        content = self.changelog_path.read_text()
+        added = 0
+        for commit in commits:
+            new_head = self.insert_changelog_entry(head, commit)
+            if new_head is not None and new_head != head:
+                head = new_head
+                added += 1
+
+        data = head.replace("\n", newline).encode("utf-8")
+
+        if not exists:
+            self.changelog_path.write_bytes(data)
+            self.save_changelog_index(len(data))
+            return added
+        if not added:
+            return 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.changelog_path.parent,
+                                        prefix=f".{self.changelog_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                dst.write(data)
+                dst.flush()
+                with open(self.changelog_path, "rb") as src:
+                    size = os.fstat(src.fileno()).st_size
+                    copy_file_range(src.fileno(), dst.fileno(), head_end, size - head_end)
+            os.chmod(tmp_path, self.changelog_path.stat().st_mode & 0o7777)
+            os.replace(tmp_path, self.changelog_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        # The head's new end is the [Unreleased] section's new end
+        self.save_changelog_index(len(data))
+        return added
+
+    def changelog_head_end(self) -> int:
+        """
+        Byte offset where the CHANGELOG.md head ends
+
+        The head is the shortest prefix that contains the whole [Unreleased]
+        section, or, without one, the first release heading it will go above.
+        """
+
+        stat = self.changelog_path.stat()
+
+        try:
+            index = json.loads(self.changelog_index.read_text())
+            if (index["size"], index["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                return index["head_end"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # Stale or missing index: one streaming scan for the section boundary
+        head_end = None
+        first_release = None
+        in_unreleased = False
+        offset = 0
+        with open(self.changelog_path, "rb") as f:
+            for line in f:
+                if in_unreleased:
+                    if line.startswith(b"## "):
+                        head_end = offset
+                        break
+                elif line.rstrip(b" \t\r\n") == b"## [Unreleased]":
+                    in_unreleased = True
+                elif first_release is None and line.startswith(b"## ["):
+                    # Keep the release heading in the head: [Unreleased] goes right above it
+                    first_release = offset + len(line)
+                offset += len(line)
+
+        if head_end is None:
+            # No [Unreleased]: it will be added above the first release
+            head_end = offset if in_unreleased or first_release is None else first_release
+
+        self.save_changelog_index(head_end)
+        return head_end
+
+    def save_changelog_index(self, head_end: int):
+        """Record the head offset together with the file's current size and mtime"""
+
+        stat = self.changelog_path.stat()
+        self.changelog_index.write_text(json.dumps({
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "head_end": head_end
+        }))
+
+    def insert_changelog_entry(self, content: str, commit: Dict) -> Optional[str]:
+        """Insert a commit entry into CHANGELOG.md content; None if there is nowhere to put it"""
 
         # Determine category
         category = self.categorize_commit(commit["message"])
@@ -297,39 +873,33 @@ class DocumentationTracker:
         short_hash = commit['hash'][:7]
         entry = f"- {commit['message'].strip()} ({short_hash})\n"
 
-        # Insert in [Unreleased] section
-        if "## [Unreleased]" not in content:
-            # Add [Unreleased] section
-            content = re.sub(
-                "(# 📝 Changelog.*?\n\n)",
-                r"\1## [Unreleased]\n\n",
-                content
-            )
-
-        # Check if category exists in [Unreleased]
-        unreleased_section = re.search(
-            r"## \[Unreleased\](.*?)(?=## \[|\Z)",
-            content,
-            re.DOTALL
-        )
+        # [Unreleased] section: from its own heading line up to the next "## " heading
+        unreleased_section = UNRELEASED_SECTION.search(content)
 
         if not unreleased_section:
-            return
-
-        unreleased_text = unreleased_section.group(1)
-
-        if f"### {category}" in unreleased_text:
+            # Add [Unreleased] above the first release, or after the title
+            anchor = re.search(r"^## \[", content, re.MULTILINE)
+            if anchor:
+                position = anchor.start()
+            elif title := re.search("# 📝 Changelog.*?\n\n", content):
+                position = title.end()
+            else:
+                return None
+            content = f"{content[:position]}## [Unreleased]\n\n{content[position:]}"
+            unreleased_section = UNRELEASED_SECTION.search(content)
+
+        body_start, body_end = unreleased_section.span("body")
+        heading = re.compile(rf"^### {category}$\n?", re.MULTILINE).search(content, body_start, body_end)
+
+        if heading:
             # Append to existing category
-            pattern = rf"(## \[Unreleased\].*?### {category}\n)"
-            replacement = rf"\1{entry}"
-            content = re.sub(pattern, replacement, content, count=1)
-        else:
-            # Add new category after ## [Unreleased]
-            pattern = r"(## \[Unreleased\]\n\n)"
-            replacement = rf"\1### {category}\n{entry}\n\n"
-            content = re.sub(pattern, replacement, content)
+            position = heading.end()
+            if not content[heading.start():position].endswith("\n"):
+                entry = "\n" + entry
+            return content[:position] + entry + content[position:]
 
-        self.changelog_path.write_text(content)
+        # Add new category at the top of [Unreleased]
+        return f"{content[:body_start]}### {category}\n{entry}\n\n{content[body_start:]}"
 
     def categorize_commit(self, message: str) -> str:
         """Categorize commit for changelog"""
@@ -348,28 +918,7 @@ class DocumentationTracker:
     def create_changelog(self):
         """Create new CHANGELOG.md"""
 
-        content = """# 📝 Changelog
-
-All notable changes to this project will be documented in this file.
-
-Format based on [Keep a Changelog](https://keepachangelog.com/ru-RU/1.0.0/).
-
-## [Unreleased]
-
-### Added
-- Initial project setup
-
----
-
-## 🔄 History
-
-| Version | Date | Changes |
-|---------|------|---------|
-| 0.1.0 | TBD | Initial release |
-
----
-"""
-        self.changelog_path.write_text(content)
+        self.changelog_path.write_text(CHANGELOG_TEMPLATE)
 
     def finalize_session(self) -> str:
         """Generate session entry when ending"""
@@ -462,22 +1011,14 @@ Format based on [Keep a Changelog](https://keepachangelog.com/ru-RU/1.0.0/).
         """Get commits since last session"""
 
         # Simple implementation: get last 10 commits
-        result = subprocess.run(
-            ["git", "log", "-10", "--format=%H|%s|%an"],
-            capture_output=True,
-            text=True,
-            cwd=self.root
-        )
-
-        commits = []
-        for line in result.stdout.strip().split("\n"):
-            if line:
-                parts = line.split("|")
-                commits.append({
-                    "hash": parts[0],
-                    "message": parts[1] if len(parts) > 1 else "",
-                    "author": parts[2] if len(parts) > 2 else ""
-                })
+        commits = [
+            {
+                "hash": commit["hash"],
+                "message": GitReader.subject(commit["message"]),
+                "author": commit["author"]
+            }
+            for commit in self.git.log("HEAD", limit=10)
+        ]
 
         return commits
 
@@ -569,18 +1110,13 @@ Format based on [Keep a Changelog](https://keepachangelog.com/ru-RU/1.0.0/).
     def get_changed_files_count(self) -> int:
         """Get count of changed files in session"""
 
-        # Simple implementation
-        result = subprocess.run(
-            ["git", "diff", "--name-only", "HEAD~10"],
-            capture_output=True,
-            text=True,
-            cwd=self.root
-        )
+        # Simple implementation: HEAD~10 tree against HEAD tree
+        old, new = self.git.commit("HEAD~10"), self.git.commit("HEAD")
 
-        if result.returncode != 0:
+        if old is None or new is None:
             return 0
 
-        files = [f for f in result.stdout.strip().split("\n") if f]
+        files = self.git.diff_trees(old["tree"], new["tree"])
         return len(files)
 
     def save_state(self, commit: Dict):
@@ -599,6 +1135,11 @@ Format based on [Keep a Changelog](https://keepachangelog.com/ru-RU/1.0.0/).
 
         self.state_file.write_text(json.dumps(state, indent=2))
 
+    def close(self):
+        """Release the git reader"""
+
+        self.git.close()
+
     def get_state(self) -> Dict:
         """Get current session state"""
 
@@ -615,12 +1156,20 @@ def main():
     if len(sys.argv) < 2:
         print("Usage:")
         print("  auto-track.py track-commit [commit-hash]")
+        print("  auto-track.py track-range <rev-range>")
         print("  auto-track.py finalize-session")
         print("  auto-track.py update-progress")
         sys.exit(1)
 
     tracker = DocumentationTracker()
-    command = sys.argv[1]
+    try:
+        run_command(tracker, sys.argv[1])
+    finally:
+        tracker.close()
+
+
+def run_command(tracker: DocumentationTracker, command: str):
+    """Run one CLI command"""
 
     if command == "track-commit":
         commit = sys.argv[2] if len(sys.argv) > 2 else "HEAD"
@@ -633,6 +1182,23 @@ def main():
         if result["progress_updated"]:
             print(f"✓ Progress recalculated")
 
+    elif command == "track-range":
+        if len(sys.argv) < 3:
+            print("Usage: auto-track.py track-range <rev-range>")
+            sys.exit(1)
+
+        try:
+            result = tracker.track_range(sys.argv[2])
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+
+        print(f"✓ {result['commits']} commits tracked")
+        if result["tasks_updated"]:
+            print(f"✓ {result['tasks_updated']} task updates, progress recalculated")
+        if result["changelog_entries"]:
+            print(f"✓ {result['changelog_entries']} CHANGELOG.md entries")
+
     elif command == "finalize-session":
         entry = tracker.finalize_session()
         print("✓ SESSION.md updated")
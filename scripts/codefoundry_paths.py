@@ -0,0 +1,26 @@
+"""
+Общие пути CodeFoundry для generate-agents.py и generate-agents-client.py
+
+Только стандартная библиотека: модуль импортирует и тонкий клиент, которому
+нельзя тянуть yaml и jinja2.
+"""
+
+import os
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    """Каталог кэша CodeFoundry ($CODEFOUNDRY_CACHE_DIR или $XDG_CACHE_HOME/codefoundry)"""
+    if env_dir := os.environ.get("CODEFOUNDRY_CACHE_DIR"):
+        return Path(env_dir)
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache) / "codefoundry"
+
+
+def default_socket_path() -> Path:
+    """Путь к Unix-сокету демона ($CODEFOUNDRY_AGENTS_SOCKET, $XDG_RUNTIME_DIR или кэш)"""
+    if env_path := os.environ.get("CODEFOUNDRY_AGENTS_SOCKET"):
+        return Path(env_path)
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime_dir) / "codefoundry" / "generate-agents.sock"
+    return default_cache_dir() / "generate-agents.sock"
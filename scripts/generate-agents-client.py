@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Agent Generator Client - Тонкий клиент демона generate-agents
+
+Передаёт командную строку запущенному `generate-agents.py --serve`
+через Unix-сокет и печатает его вывод. Если демон не запущен, выполняет
+generate-agents.py в этом же процессе с теми же аргументами.
+
+Клиент использует только стандартную библиотеку: yaml и jinja2
+импортируются лишь при fallback.
+
+Usage:
+    python3 generate-agents-client.py <аргументы generate-agents.py>
+"""
+
+import os
+import sys
+import json
+import runpy
+import socket
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+from codefoundry_paths import default_socket_path
+
+GENERATOR_SCRIPT = Path(__file__).parent / "generate-agents.py"
+
+# Режимы, которые всегда выполняются локально
+LOCAL_ONLY_FLAGS = {"--serve", "--profile"}
+
+
+def request_daemon(argv: List[str], socket_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    Отправить команду демону
+
+    Returns:
+        Ответ демона или None, если демон недоступен
+    """
+    if not socket_path.exists():
+        return None
+
+    payload = json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.settimeout(1.0)
+            client.connect(str(socket_path))
+            client.settimeout(None)
+            client.sendall(payload.encode("utf-8"))
+            with client.makefile("rb") as reader:
+                line = reader.readline()
+        except OSError:
+            return None
+
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def run_in_process(argv: List[str]) -> None:
+    """Выполнить generate-agents.py в текущем процессе"""
+    sys.argv = [str(GENERATOR_SCRIPT)] + argv
+    runpy.run_path(str(GENERATOR_SCRIPT), run_name="__main__")
+
+
+def main():
+    """CLI клиента"""
+    argv = sys.argv[1:]
+
+    response = None
+    if not LOCAL_ONLY_FLAGS.intersection(argv):
+        response = request_daemon(argv, default_socket_path())
+
+    if response is None:
+        run_in_process(argv)
+        return
+
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    sys.exit(response.get("exit_code", 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,22 +6,77 @@ Agent Generator - Генерация файлов агентов из шабло
 """
 
 import os
+import re
 import sys
 import json
+import time
 import shutil
+import tempfile
+import io
+import signal
+import socket
+import hashlib
+import argparse
+import socketserver
+from contextlib import redirect_stdout, redirect_stderr
+from collections import ChainMap
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Mapping, Tuple, Iterable, Set
 from datetime import datetime
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+)
+import copy
 import yaml
 
+from codefoundry_paths import default_cache_dir, default_socket_path
+
 try:
-    from jinja2 import Environment, FileSystemLoader, Template
+    from jinja2 import Environment, FileSystemLoader, Template, FileSystemBytecodeCache, meta
+    from jinja2.bccache import Bucket
 except ImportError:
     print("Installing Jinja2...")
     import subprocess
     subprocess.run([sys.executable, "-m", "pip", "install", "jinja2"], check=True)
-    from jinja2 import Environment, FileSystemLoader, Template
+    from jinja2 import Environment, FileSystemLoader, Template, FileSystemBytecodeCache, meta
+    from jinja2.bccache import Bucket
+
+
+class ContentHashBytecodeCache(FileSystemBytecodeCache):
+    """
+    Дисковый кэш скомпилированных шаблонов
+
+    Ключ строится из имени шаблона, хэша его исходника и опций лексера,
+    поэтому одинаковые шаблоны из разных checkout'ов делят одну запись,
+    а изменённый шаблон никогда не получит устаревший байткод.
+    """
+
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(directory))
+
+    def get_bucket(self, environment, name, filename, source) -> Bucket:
+        checksum = self.get_source_checksum(source)
+        options = (
+            environment.trim_blocks,
+            environment.lstrip_blocks,
+            environment.keep_trailing_newline,
+        )
+        key = hashlib.sha1(f"{name}|{checksum}|{options}".encode("utf-8")).hexdigest()
+        bucket = Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+
+def clear_template_cache(cache_dir: Optional[Path] = None) -> None:
+    """Удалить все записи дискового кэша скомпилированных шаблонов"""
+    ContentHashBytecodeCache(Path(cache_dir) if cache_dir else default_cache_dir() / "jinja").clear()
+
+
+# libyaml-ускоренные loader/dumper, если PyYAML собран с ним
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
 
 @dataclass
@@ -50,15 +105,407 @@ class AgentGenerationRequest:
     context: Dict[str, Any] = field(default_factory=dict)
 
 
+@dataclass
+class DedupStats:
+    """Статистика дедупликации через общее хранилище контента"""
+    files: int = 0
+    logical_bytes: int = 0
+    shared_bytes: int = 0
+    stored_bytes: int = 0
+    methods: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ratio(self) -> float:
+        """Логический объём / реально занятое место (неразделённые файлы + новые объекты)"""
+        if not self.logical_bytes:
+            return 1.0
+        physical = self.logical_bytes - self.shared_bytes + self.stored_bytes
+        return self.logical_bytes / physical if physical else float("inf")
+
+    def merge(self, other: "DedupStats") -> None:
+        self.files += other.files
+        self.logical_bytes += other.logical_bytes
+        self.shared_bytes += other.shared_bytes
+        self.stored_bytes += other.stored_bytes
+        for method, count in other.methods.items():
+            self.methods[method] = self.methods.get(method, 0) + count
+
+
+@dataclass
+class BatchResult:
+    """Результат генерации одного проекта в batch-режиме"""
+    project_name: str
+    output_dir: Path
+    agents_count: int = 0
+    skipped_count: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    dedup: Optional[DedupStats] = None
+
+
+@dataclass
+class RenderStats:
+    """Профиль генерации одного выходного файла (для --stats)"""
+    output: str
+    template: str
+    context_seconds: float = 0.0
+    render_seconds: float = 0.0
+    write_seconds: float = 0.0
+    bytes: int = 0
+    chars: int = 0
+
+    @property
+    def tokens(self) -> int:
+        """Оценка токенов (символы / 4, как в validate-token-budget.sh)"""
+        return self.chars // 4
+
+    @property
+    def total_seconds(self) -> float:
+        return self.context_seconds + self.render_seconds + self.write_seconds
+
+
+@dataclass
+class GenerationSummary:
+    """Итоги последнего вызова AgentGenerator.generate"""
+    regenerated: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    stats: List[RenderStats] = field(default_factory=list)
+    dedup: DedupStats = field(default_factory=DedupStats)
+
+
+# Теги, подключающие другие шаблоны (быстрая проверка перед полным разбором)
+_TEMPLATE_REFERENCE = re.compile(r"{%[-+]?\s*(?:include|extends|import|from)\b")
+
+# Форматы, которые генерирует format="all". cursor сюда не входит: его
+# директория — корень проекта, и он перезаписал бы AGENTS.md проекта
+# (генерируется только явным --format cursor)
+OUTPUT_FORMATS = ("claude-code", "qoder", "cliner")
+
+# Ключи контекста, меняющиеся без изменения входов (не участвуют в хэше)
+VOLATILE_CONTEXT_KEYS = frozenset({"creation_date", "last_updated"})
+
+
+class _FrozenDict(dict):
+    """Неизменяемый dict (repr и JSON как у обычного dict)"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("shared defaults are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class _FrozenList(tuple):
+    """Неизменяемый список (repr и JSON как у обычного list)"""
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def _freeze(value: Any) -> Any:
+    """Рекурсивно заморозить dict/list, чтобы значение можно было разделять между агентами"""
+    if isinstance(value, dict):
+        return _FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return _FrozenList(_freeze(v) for v in value)
+    return value
+
+
+# Права новых файлов, как у write_text (0o666 с учётом umask); вычисляются один раз при первой записи
+_NEW_FILE_MODE: Optional[int] = None
+
+
+def _new_file_mode(directory: Path) -> int:
+    """Узнать права, которые ядро даёт новому файлу, не меняя umask процесса.
+
+    os.umask(0) временно снимает маску для всех потоков демона, поэтому маска
+    определяется по пробному файлу, созданному с 0o666.
+    """
+    global _NEW_FILE_MODE
+    if _NEW_FILE_MODE is None:
+        fd, probe = tempfile.mkstemp(dir=directory, prefix=".umask-")
+        os.close(fd)
+        os.unlink(probe)
+        fd = os.open(probe, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            _NEW_FILE_MODE = os.fstat(fd).st_mode & 0o777
+        finally:
+            os.close(fd)
+            os.unlink(probe)
+    return _NEW_FILE_MODE
+
+
+def _atomic_replace(tmp_path: str, path: Path) -> None:
+    """Выставить обычные права временному файлу и атомарно переименовать его в path"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        stat = None
+    if stat is None or stat.st_nlink > 1:
+        # Новый файл или hardlink на read-only объект dedup-хранилища: обычные права
+        mode = _new_file_mode(path.parent)
+    else:
+        mode = stat.st_mode & 0o7777
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+class _TimedChunks:
+    """Итератор чанков рендера, считающий время их генерации и число символов"""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.seconds = 0.0
+        self.chars = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        start = time.perf_counter()
+        try:
+            chunk = next(self._chunks)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.chars += len(chunk)
+        return chunk
+
+
+def write_chunks_atomic(path: Path, chunks: Iterable[str]) -> None:
+    """
+    Записать поток строк в path атомарно
+
+    Чанки пишутся во временный файл в той же директории, который затем
+    переименовывается в path: память ограничена размером чанка, а
+    недописанный файл никогда не виден под итоговым именем.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        _atomic_replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def copy_file_atomic(source: Path, path: Path) -> None:
+    """Атомарно скопировать уже записанный файл в path"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_path)
+        _atomic_replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+# ioctl FICLONE (Linux): reflink — общий экстент с копированием при записи
+_FICLONE = 0x40049409
+
+
+def _reflink(source: Path, target: str) -> bool:
+    """Попробовать создать target как reflink-копию source"""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def _hash_file(path: Path) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """
+    Общее хранилище отрендеренных файлов, адресуемое по SHA-256 содержимого
+
+    Объект objects/<ab>/<sha256> доступен только для чтения (0444); перед
+    переиспользованием его хэш сверяется с именем, испорченный объект
+    создаётся заново. По умолчанию объекты и файлы проектов связываются
+    reflink'ами (копирование при записи), так что правка одного проекта не
+    затрагивает ни хранилище, ни другие проекты. Без поддержки reflink
+    (ext4 и т.п.) файл остаётся как есть и в хранилище не попадает: обычная
+    копия только добавила бы места на диске.
+
+    Hardlink'и включаются явно (hardlinks=True): объект — независимая копия,
+    а файлы проектов делят с ним inode и, как и он, доступны только для чтения.
+    """
+
+    def __init__(self, root: Path, hardlinks: bool = False):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.hardlinks = hardlinks
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _store(self, path: Path, object_path: Path) -> bool:
+        """
+        Положить в хранилище read-only копию path, независимую от его inode
+
+        Без hardlink'ов объект создаётся только reflink'ом; если файловая
+        система его не умеет, возвращается False и объект не создаётся.
+        """
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=object_path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            if not _reflink(path, tmp_path):
+                if not self.hardlinks:
+                    os.unlink(tmp_path)
+                    return False
+                shutil.copyfile(path, tmp_path)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return True
+
+    def link(self, path: Path) -> Tuple[str, int, int]:
+        """
+        Связать path с объектом хранилища с тем же содержимым
+
+        Returns:
+            (способ: "reflink", "hardlink" или "unshared", размер файла,
+             байт, добавленных на диск новым объектом)
+        """
+        digest = _hash_file(path)
+        object_path = self._object_path(digest)
+        size = path.stat().st_size
+
+        if self.hardlinks:
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            if path.stat().st_dev != self.objects_dir.stat().st_dev:
+                # Hardlink между файловыми системами невозможен: не копировать зря в хранилище
+                return "unshared", size, 0
+
+        added = 0
+        if not (object_path.exists() and _hash_file(object_path) == digest):
+            if not self._store(path, object_path):
+                return "unshared", size, 0
+            if not self.hardlinks:
+                # Объект — reflink этого файла: экстенты уже общие
+                return "reflink", size, 0
+            added = size
+
+        if self.hardlinks and os.path.samefile(path, object_path):
+            return "hardlink", size, added
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            if self.hardlinks:
+                os.unlink(tmp_path)
+                try:
+                    os.link(object_path, tmp_path)
+                except OSError:
+                    return "unshared", size, added
+                method = "hardlink"
+            elif _reflink(object_path, tmp_path):
+                method = "reflink"
+                os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+            else:
+                os.unlink(tmp_path)
+                return "unshared", size, added
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return method, size, added
+
+
+def _hash_text(text: str) -> str:
+    """SHA-256 строки"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _hash_json(data: Any) -> str:
+    """SHA-256 канонического JSON-представления"""
+    return _hash_text(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class GenerationLock:
+    """
+    Lock-файл .codefoundry/generated.lock
+
+    Для каждого выходного файла хранит хэши шаблона, контекста и записи
+    agents.yaml. Если при следующем запуске все хэши совпадают и файл
+    существует, рендер и запись пропускаются.
+    """
+
+    VERSION = 1
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.path = output_dir / ".codefoundry" / "generated.lock"
+        self.entries: Dict[str, Dict[str, str]] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == self.VERSION:
+                self.entries = data.get("outputs", {})
+
+    def _key(self, file_path: Path) -> str:
+        return file_path.relative_to(self.output_dir).as_posix()
+
+    def is_fresh(self, file_path: Path, inputs: Dict[str, str]) -> bool:
+        """Проверить, что файл существует и собран из тех же входов"""
+        return self.entries.get(self._key(file_path)) == inputs and file_path.exists()
+
+    def record(self, file_path: Path, inputs: Dict[str, str]) -> None:
+        """Запомнить входы, из которых собран файл"""
+        self.entries[self._key(file_path)] = inputs
+
+    def save(self) -> None:
+        """Сохранить lock-файл"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": self.VERSION, "outputs": dict(sorted(self.entries.items()))}
+        self.path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+
 class AgentGenerator:
     """Генератор файлов агентов из шаблонов"""
 
-    def __init__(self, templates_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        templates_dir: Optional[Path] = None,
+        verbose: bool = True,
+        cache_dir: Optional[Path] = None,
+        use_cache: bool = True,
+        dedup_store: Optional[Path] = None,
+        dedup_hardlinks: bool = False
+    ):
         """
         Инициализация генератора
 
         Args:
             templates_dir: Директория с шаблонами (по умолчанию templates/agents/)
+            verbose: Печатать прогресс по каждому агенту
+            cache_dir: Кэш скомпилированных шаблонов (по умолчанию default_cache_dir()/jinja)
+            use_cache: Использовать дисковый кэш скомпилированных шаблонов
+            dedup_store: Общее хранилище для дедупликации одинаковых файлов (opt-in)
+            dedup_hardlinks: Связывать файлы с хранилищем hardlink'ами (read-only)
         """
         # Определяем пути
         if templates_dir is None:
@@ -67,39 +514,93 @@ class AgentGenerator:
             templates_dir = script_dir.parent / "templates" / "agents"
 
         self.templates_dir = Path(templates_dir)
+        self.verbose = verbose
+        self.content_store = ContentStore(dedup_store, dedup_hardlinks) if dedup_store else None
+        self.bytecode_cache = None
+        if use_cache:
+            self.bytecode_cache = ContentHashBytecodeCache(
+                Path(cache_dir) if cache_dir else default_cache_dir() / "jinja"
+            )
         self.env = Environment(
             loader=FileSystemLoader(str(self.templates_dir)),
             trim_blocks=True,
-            lstrip_blocks=True
+            lstrip_blocks=True,
+            bytecode_cache=self.bytecode_cache
         )
 
         # Метаданные версии шаблонов
         self.template_version = "1.0.0"
         self.creation_date = datetime.now().strftime("%Y-%m-%d")
+        self.last_summary = GenerationSummary()
+        # template hash -> использует ли шаблон переменную format
+        self._format_dependent: Dict[str, bool] = {}
+        # source hash -> шаблоны, которые подключает исходник (None — динамическое имя)
+        self._references: Dict[str, Optional[List[str]]] = {}
+        # (language, framework, date) -> замороженные defaults, общие для всех агентов
+        self._defaults_cache: Dict[Tuple[str, Optional[str], str], Mapping[str, Any]] = {}
+
+    def _log(self, message: str) -> None:
+        """Вывести сообщение о прогрессе (если включён verbose)"""
+        if self.verbose:
+            print(message)
+
+    def warm_up(self) -> int:
+        """
+        Заранее скомпилировать все шаблоны окружения
+
+        Returns:
+            Количество загруженных шаблонов
+        """
+        names = self.env.list_templates(extensions=["template"])
+        for name in names:
+            self.env.get_template(name)
+        return len(names)
 
     def generate(
         self,
         request: AgentGenerationRequest,
-        format: str = "claude-code"
+        format: str = "claude-code",
+        force: bool = False
     ) -> Dict[str, Path]:
         """
         Сгенерировать файлы агентов
 
+        Файлы, чьи входы совпадают с записями .codefoundry/generated.lock,
+        не перерендериваются и не перезаписываются. Итоги сохраняются
+        в self.last_summary.
+
+        format="all" строит контекст каждого агента один раз и раскладывает
+        результат по всем форматам из OUTPUT_FORMATS за один проход.
+
         Args:
             request: Запрос на генерацию
-            format: Формат выходных файлов (claude-code, cursor, qoder, all)
+            format: Формат выходных файлов (claude-code, cursor, qoder, cliner,
+                    all = все из OUTPUT_FORMATS, без cursor)
+            force: Игнорировать lock-файл и перегенерировать всё
 
         Returns:
-            Словарь {agent_id: path_to_file}
+            Словарь {agent_id: path_to_file}; для format="all" ключи
+            имеют вид "<format>:<agent_id>"
         """
         if not self.templates_dir.exists():
             raise FileNotFoundError(f"Templates directory not found: {self.templates_dir}")
 
-        # Создаём директорию для агентов
-        agents_dir = self._get_agents_dir(request.output_dir, format)
-        agents_dir.mkdir(parents=True, exist_ok=True)
+        # Генератор может жить дольше суток (демон) — дата берётся на каждый вызов
+        self.creation_date = datetime.now().strftime("%Y-%m-%d")
+        formats = list(OUTPUT_FORMATS) if format == "all" else [format]
+
+        # Создаём директории для агентов
+        agents_dirs = {}
+        for fmt in formats:
+            agents_dirs[fmt] = self._get_agents_dir(request.output_dir, fmt)
+            agents_dirs[fmt].mkdir(parents=True, exist_ok=True)
+
+        lock = GenerationLock(request.output_dir)
+        if force:
+            lock.entries.clear()
+        self.last_summary = GenerationSummary()
 
-        generated_files = {}
+        generated_by_format: Dict[str, Dict[str, Path]] = {fmt: {} for fmt in formats}
 
         # Генерируем каждого агента
         for agent_config in request.agents:
@@ -107,26 +608,120 @@ class AgentGenerator:
                 continue
 
             try:
-                agent_file = self._generate_agent(
+                agent_files = self._generate_agent(
                     agent_config,
                     request,
-                    agents_dir,
-                    format
+                    agents_dirs,
+                    lock
                 )
-                generated_files[agent_config.id] = agent_file
-                print(f"  ✓ Generated: {agent_config.id} → {agent_file.name}")
+                for fmt, agent_file in agent_files.items():
+                    generated_by_format[fmt][agent_config.id] = agent_file
+
+                names = ", ".join(sorted({path.name for path in agent_files.values()}))
+                if all(self._label(agent_config.id, fmt, formats) in self.last_summary.skipped
+                       for fmt in formats):
+                    self._log(f"  = Unchanged: {agent_config.id} → {names}")
+                else:
+                    self._log(f"  ✓ Generated: {agent_config.id} → {names}")
 
             except Exception as e:
-                print(f"  ✗ Failed: {agent_config.id} - {e}")
+                self._log(f"  ✗ Failed: {agent_config.id} - {e}")
+
+        # Генерируем файлы оркестрации (AGENTS.md), одинаковый контент рендерится один раз
+        rendered_orchestration: Dict[str, Tuple[Path, int]] = {}
+        for fmt in formats:
+            generated_files = generated_by_format[fmt]
+            if not generated_files:
+                continue
 
-        # Генерируем файл оркестрации (AGENTS.md)
-        if generated_files:
-            orchestration_file = self._generate_orchestration(
-                request, agents_dir, generated_files
+            label = self._label("AGENTS.md", fmt, formats)
+            self._generate_orchestration(
+                request, agents_dirs[fmt], generated_files, lock, rendered_orchestration, label
             )
-            print(f"  ✓ Orchestration: {orchestration_file.name}")
+            if label in self.last_summary.skipped:
+                self._log(f"  = Orchestration unchanged: {label}")
+            else:
+                self._log(f"  ✓ Orchestration: {label}")
 
-        return generated_files
+        lock.save()
+
+        if len(formats) == 1:
+            return generated_by_format[formats[0]]
+        return {
+            f"{fmt}:{agent_id}": path
+            for fmt in formats
+            for agent_id, path in generated_by_format[fmt].items()
+        }
+
+    @staticmethod
+    def _label(name: str, fmt: str, formats: List[str]) -> str:
+        """Имя выхода для отчёта (с префиксом формата, если форматов несколько)"""
+        return name if len(formats) == 1 else f"{fmt}:{name}"
+
+    def _deduplicate(self, file_path: Path) -> None:
+        """Связать записанный файл с общим хранилищем (если оно включено)"""
+        if self.content_store is None:
+            return
+        method, size, added = self.content_store.link(file_path)
+        dedup = self.last_summary.dedup
+        dedup.files += 1
+        dedup.logical_bytes += size
+        if method != "unshared":
+            dedup.shared_bytes += size
+        dedup.stored_bytes += added
+        dedup.methods[method] = dedup.methods.get(method, 0) + 1
+
+    def _template_sources(self, name: str) -> Dict[str, str]:
+        """
+        Исходники шаблона и всех шаблонов, которые он подключает
+
+        Обходит {% include/extends/import/from %} рекурсивно; если имя
+        подключаемого шаблона вычисляется при рендере, зависимостью
+        считается любой шаблон окружения.
+
+        Returns:
+            Словарь {имя шаблона: исходник}, первым идёт сам name
+        """
+        sources: Dict[str, str] = {}
+        pending = [name]
+        while pending:
+            current = pending.pop()
+            if current in sources:
+                continue
+            source, _, _ = self.env.loader.get_source(self.env, current)
+            sources[current] = source
+            references = self._template_references(source)
+            pending.extend(self.env.list_templates() if references is None else references)
+        return sources
+
+    def _template_references(self, source: str) -> Optional[List[str]]:
+        """Имена шаблонов, подключаемых исходником (None — есть динамическое имя)"""
+        source_hash = _hash_text(source)
+        if source_hash not in self._references:
+            references: Optional[List[str]] = []
+            # Разбор дорогой — только если в шаблоне вообще есть подключения
+            if _TEMPLATE_REFERENCE.search(source):
+                found = list(meta.find_referenced_templates(self.env.parse(source)))
+                references = None if None in found else found
+            self._references[source_hash] = references
+        return self._references[source_hash]
+
+    @staticmethod
+    def _sources_hash(sources: Dict[str, str]) -> str:
+        """Хэш шаблона вместе с подключениями (без подключений — хэш его исходника)"""
+        if len(sources) == 1:
+            return _hash_text(next(iter(sources.values())))
+        return _hash_json({name: _hash_text(source) for name, source in sources.items()})
+
+    def _uses_format(self, template_hash: str, source: str) -> bool:
+        """Проверить, зависит ли шаблон от переменной format"""
+        if template_hash not in self._format_dependent:
+            # Полный разбор шаблона дорогой — делаем его, только если слово вообще встречается
+            uses = re.search(r"\bformat\b", source) is not None
+            if uses:
+                uses = "format" in meta.find_undeclared_variables(self.env.parse(source))
+            self._format_dependent[template_hash] = uses
+        return self._format_dependent[template_hash]
 
     def _get_agents_dir(self, output_dir: Path, format: str) -> Path:
         """Получить директорию для файлов агентов"""
@@ -146,43 +741,114 @@ class AgentGenerator:
         self,
         agent_config: AgentConfig,
         request: AgentGenerationRequest,
-        agents_dir: Path,
-        format: str
-    ) -> Path:
-        """Сгенерировать файл одного агента"""
+        agents_dirs: Dict[str, Path],
+        lock: GenerationLock
+    ) -> Dict[str, Path]:
+        """
+        Сгенерировать файлы одного агента во всех запрошенных форматах
 
-        # Загружаем шаблон
+        Контекст и хэши входов строятся один раз. Шаблон рендерится потоком
+        прямо в файл; если он не использует переменную format, то рендерится
+        один раз, а остальные форматы получают копию записанного файла.
+        Неизменённые (по lock-файлу) файлы пропускаются.
+
+        Returns:
+            Словарь {format: path_to_file}
+        """
+
+        # Исходники шаблона и всего, что он подключает
         template_path = f"{agent_config.template}.template"
         try:
-            template = self.env.get_template(template_path)
+            sources = self._template_sources(template_path)
         except Exception as e:
             raise FileNotFoundError(f"Template not found: {template_path}") from e
 
-        # Подготавливаем контекст для рендеринга
-        context = self._prepare_context(agent_config, request, format)
-
-        # Рендерим
-        content = template.render(**context)
+        formats = list(agents_dirs)
 
-        # Определяем имя файла
-        filename = self._get_filename(agent_config, format)
-        file_path = agents_dir / filename
+        # Подготавливаем контекст для рендеринга
+        start = time.perf_counter()
+        context = self._prepare_context(agent_config, request, formats[0])
 
-        # Записываем
-        file_path.write_text(content, encoding="utf-8")
+        template_hash = self._sources_hash(sources)
+        context_hash = _hash_json({
+            k: v for k, v in context.items()
+            if k not in VOLATILE_CONTEXT_KEYS and k != "format"
+        })
+        config_hash = _hash_json(asdict(agent_config))
+        uses_format = len(formats) > 1 and any(
+            self._uses_format(_hash_text(source), source) for source in sources.values()
+        )
+        context_seconds = time.perf_counter() - start
+
+        template = None
+        shared_file = None
+        shared_chars = 0
+        agent_files = {}
+
+        for fmt, agents_dir in agents_dirs.items():
+            # Определяем имя файла
+            file_path = agents_dir / self._get_filename(agent_config, fmt)
+            agent_files[fmt] = file_path
+            label = self._label(agent_config.id, fmt, formats)
+
+            inputs = {
+                "template": template_hash,
+                "context": context_hash,
+                "format": fmt,
+                "config": config_hash,
+            }
+            if lock.is_fresh(file_path, inputs):
+                self.last_summary.skipped.append(label)
+                continue
 
-        return file_path
+            # Рендерим потоком в файл (один раз, если шаблон не зависит от формата)
+            stats = RenderStats(output=label, template=template_path, context_seconds=context_seconds)
+            context_seconds = 0.0
+            start = time.perf_counter()
+            if template is None:
+                template = self.env.get_template(template_path)
+            load_seconds = time.perf_counter() - start
+
+            if uses_format or shared_file is None:
+                own_context = context.new_child({"format": fmt}) if uses_format else context
+                chunks = _TimedChunks(template.generate(**own_context))
+                start = time.perf_counter()
+                write_chunks_atomic(file_path, chunks)
+                stats.render_seconds = load_seconds + chunks.seconds
+                stats.write_seconds = time.perf_counter() - start - chunks.seconds
+                stats.chars = chunks.chars
+                if not uses_format:
+                    shared_file, shared_chars = file_path, chunks.chars
+            else:
+                start = time.perf_counter()
+                copy_file_atomic(shared_file, file_path)
+                stats.write_seconds = time.perf_counter() - start
+                stats.chars = shared_chars
+            stats.bytes = file_path.stat().st_size
+            self._deduplicate(file_path)
+
+            lock.record(file_path, inputs)
+            self.last_summary.regenerated.append(label)
+            self.last_summary.stats.append(stats)
+
+        return agent_files
 
     def _prepare_context(
         self,
         agent_config: AgentConfig,
         request: AgentGenerationRequest,
         format: str
-    ) -> Dict[str, Any]:
-        """Подготовить контекст для рендеринга шаблона"""
+    ) -> ChainMap:
+        """
+        Подготовить контекст для рендеринга шаблона
+
+        Слои собираются в ChainMap без копирования; приоритет (от высшего):
+        defaults, технологический стек, контекст проекта, конфиг агента,
+        базовый контекст.
+        """
 
         # Базовый контекст
-        context = {
+        base = {
             "version": "1.0.0",
             "template_version": self.template_version,
             "creation_date": self.creation_date,
@@ -193,25 +859,31 @@ class AgentGenerator:
             "format": format,
         }
 
-        # Добавляем настройки из конфига агента
-        context.update(agent_config.config)
-
-        # Добавляем общий контекст проекта
-        context.update(request.context)
-
         # Технологический стек
-        context["primary_language"] = request.primary_language
+        stack = {"primary_language": request.primary_language}
         if request.framework:
-            context["framework"] = request.framework
+            stack["framework"] = request.framework
 
-        # Значения по умолчанию
+        # Значения по умолчанию (общие для всех агентов с тем же стеком)
         defaults = self._get_defaults(request.primary_language, request.framework)
-        context.update(defaults)
 
-        return context
+        return ChainMap(defaults, stack, request.context, agent_config.config, base)
+
+    def _get_defaults(self, language: str, framework: Optional[str]) -> Mapping[str, Any]:
+        """
+        Получить значения по умолчанию для языка/фреймворка
+
+        Вычисляются один раз на (language, framework) и замораживаются,
+        поэтому разделяются всеми агентами без копирования. Дата входит
+        в ключ, т.к. метаданные содержат last_updated.
+        """
+        key = (language.lower(), framework.lower() if framework else None, self.creation_date)
+        if key not in self._defaults_cache:
+            self._defaults_cache[key] = _freeze(self._build_defaults(language, framework))
+        return self._defaults_cache[key]
 
-    def _get_defaults(self, language: str, framework: Optional[str]) -> Dict[str, Any]:
-        """Получить значения по умолчанию для языка/фреймворка"""
+    def _build_defaults(self, language: str, framework: Optional[str]) -> Dict[str, Any]:
+        """Построить значения по умолчанию для языка/фреймворка"""
 
         defaults_map = {
             "python": {
@@ -536,36 +1208,80 @@ class AgentGenerator:
         self,
         request: AgentGenerationRequest,
         agents_dir: Path,
-        generated_files: Dict[str, Path]
+        generated_files: Dict[str, Path],
+        lock: GenerationLock,
+        rendered: Optional[Dict[str, Tuple[Path, int]]] = None,
+        label: Optional[str] = None
     ) -> Path:
-        """Сгенерировать файл оркестрации AGENTS.md"""
+        """
+        Сгенерировать файл оркестрации AGENTS.md (или пропустить неизменённый)
+
+        rendered — общий для форматов кэш {хэш входов: (записанный файл, символы)},
+        чтобы одинаковый AGENTS.md не рендерился повторно; label — имя выхода
+        в self.last_summary.
+        """
+
+        orchestration_path = agents_dir / "AGENTS.md"
+        context = {
+            "project_name": request.project_name,
+            "project_type": request.project_type,
+            "agents": [
+                {
+                    "id": agent_id,
+                    "name": file_path.stem,
+                    "file": file_path.name
+                }
+                for agent_id, file_path in generated_files.items()
+            ],
+            "version": "1.0.0",
+            "creation_date": self.creation_date
+        }
 
         # Загружаем шаблон оркестрации
         template_path = "orchestration.template"
         try:
-            template = self.env.get_template(template_path)
+            sources = self._template_sources(template_path)
         except Exception:
             # Если шаблон не найден, используем встроенный
-            content = self._default_orchestration(request, generated_files)
+            sources = None
+
+        inputs = {
+            "template": (self._sources_hash(sources) if sources is not None
+                         else f"builtin:{self.template_version}"),
+            "context": _hash_json({
+                k: v for k, v in context.items() if k not in VOLATILE_CONTEXT_KEYS
+            }),
+        }
+        label = label or orchestration_path.name
+        if lock.is_fresh(orchestration_path, inputs):
+            self.last_summary.skipped.append(label)
+            return orchestration_path
+
+        if rendered is None:
+            rendered = {}
+        stats = RenderStats(output=label, template=template_path if sources is not None else "<builtin>")
+        key = inputs["template"] + inputs["context"]
+        start = time.perf_counter()
+        if key in rendered:
+            shared_path, stats.chars = rendered[key]
+            copy_file_atomic(shared_path, orchestration_path)
+            stats.write_seconds = time.perf_counter() - start
         else:
-            context = {
-                "project_name": request.project_name,
-                "project_type": request.project_type,
-                "agents": [
-                    {
-                        "id": agent_id,
-                        "name": file_path.stem,
-                        "file": file_path.name
-                    }
-                    for agent_id, file_path in generated_files.items()
-                ],
-                "version": "1.0.0",
-                "creation_date": self.creation_date
-            }
-            content = template.render(**context)
-
-        orchestration_path = agents_dir / "AGENTS.md"
-        orchestration_path.write_text(content, encoding="utf-8")
+            if sources is None:
+                chunks = _TimedChunks([self._default_orchestration(request, generated_files)])
+            else:
+                chunks = _TimedChunks(self.env.get_template(template_path).generate(**context))
+            write_chunks_atomic(orchestration_path, chunks)
+            stats.render_seconds = chunks.seconds
+            stats.write_seconds = time.perf_counter() - start - chunks.seconds
+            stats.chars = chunks.chars
+            rendered[key] = (orchestration_path, chunks.chars)
+        stats.bytes = orchestration_path.stat().st_size
+        self._deduplicate(orchestration_path)
+
+        lock.record(orchestration_path, inputs)
+        self.last_summary.regenerated.append(label)
+        self.last_summary.stats.append(stats)
 
         return orchestration_path
 
@@ -625,17 +1341,26 @@ Agents are automatically routed based on keywords or can be explicitly selected:
 """
 
 
-def load_agents_config(config_path: Path) -> List[AgentConfig]:
-    """Загрузить конфигурацию агентов из YAML файла"""
+# In-memory кэш разобранных agents.yaml:
+# путь -> (size, mtime_ns, sha256, агенты)
+_agents_config_cache: Dict[str, Tuple[int, int, str, List[AgentConfig]]] = {}
 
-    if not config_path.exists():
-        raise FileNotFoundError(f"Config file not found: {config_path}")
 
-    with open(config_path) as f:
-        data = yaml.safe_load(f)
+def agents_config_cache_dir() -> Path:
+    """Директория дискового кэша разобранных agents.yaml"""
+    return default_cache_dir() / "agents-config"
 
+
+def clear_agents_config_cache(cache_dir: Optional[Path] = None) -> None:
+    """Очистить in-memory и дисковый кэш разобранных agents.yaml"""
+    _agents_config_cache.clear()
+    shutil.rmtree(Path(cache_dir) if cache_dir else agents_config_cache_dir(), ignore_errors=True)
+
+
+def parse_agents_config(data: Dict[str, Any]) -> List[AgentConfig]:
+    """Построить список AgentConfig из разобранного agents.yaml"""
     agents = []
-    for agent_data in data.get("agents", []):
+    for agent_data in (data or {}).get("agents", []):
         agents.append(AgentConfig(
             id=agent_data["id"],
             name=agent_data["name"],
@@ -651,6 +1376,74 @@ def load_agents_config(config_path: Path) -> List[AgentConfig]:
     return agents
 
 
+def _read_cached_agents(cache_file: Path) -> Optional[List[AgentConfig]]:
+    """Прочитать список агентов из дискового кэша (None — промах)"""
+    try:
+        rows = json.loads(cache_file.read_text(encoding="utf-8"))
+        return [AgentConfig(**row) for row in rows]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _write_cached_agents(cache_file: Path, agents: List[AgentConfig]) -> None:
+    """
+    Сохранить список агентов в дисковый кэш
+
+    Пропускается, если config агентов не переживает JSON без потерь
+    (даты, нестроковые ключи) — такие файлы просто разбираются каждый раз.
+    """
+    rows = [asdict(agent) for agent in agents]
+    try:
+        payload = json.dumps(rows, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return
+    if json.loads(payload) != rows:
+        return
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        write_chunks_atomic(cache_file, [payload])
+    except OSError:
+        pass
+
+
+def load_agents_config(config_path: Path, use_cache: bool = True) -> List[AgentConfig]:
+    """
+    Загрузить конфигурацию агентов из YAML файла
+
+    Разобранный результат кэшируется: в памяти по (size, mtime_ns) файла
+    с проверкой SHA-256 содержимого при изменении stat, на диске — по
+    SHA-256 в agents_config_cache_dir(). Повторные запуски и batch-прогоны
+    не разбирают YAML заново, пока файл не изменился.
+    """
+
+    if not config_path.exists():
+        raise FileNotFoundError(f"Config file not found: {config_path}")
+
+    if not use_cache:
+        with open(config_path, "rb") as f:
+            return parse_agents_config(yaml.load(f, Loader=YAML_LOADER))
+
+    key = str(config_path.resolve())
+    stat = config_path.stat()
+    cached = _agents_config_cache.get(key)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return copy.deepcopy(cached[3])
+
+    raw = config_path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached[2] == digest:
+        agents = cached[3]
+    else:
+        cache_file = agents_config_cache_dir() / f"{digest}.json"
+        agents = _read_cached_agents(cache_file)
+        if agents is None:
+            agents = parse_agents_config(yaml.load(raw, Loader=YAML_LOADER))
+            _write_cached_agents(cache_file, agents)
+
+    _agents_config_cache[key] = (stat.st_size, stat.st_mtime_ns, digest, agents)
+    return copy.deepcopy(agents)
+
+
 def create_default_config(project_type: str) -> Dict[str, Any]:
     """Создать конфигурацию агентов по умолчанию для типа проекта"""
 
@@ -734,7 +1527,475 @@ def create_default_config(project_type: str) -> Dict[str, Any]:
     return {"agents": agents}
 
 
-def _run_profile_mode():
+def resolve_agents(
+    request: AgentGenerationRequest,
+    verbose: bool = True,
+    use_cache: bool = True
+) -> None:
+    """
+    Заполнить request.agents из .codefoundry/agents.yaml проекта
+
+    Если конфиг отсутствует, используется конфигурация по умолчанию
+    для типа проекта, которая сохраняется для будущих запусков.
+    Явно заданный список агентов не перезаписывается.
+    """
+    if request.agents:
+        return
+
+    config_path = request.output_dir / ".codefoundry" / "agents.yaml"
+    if config_path.exists():
+        request.agents = load_agents_config(config_path, use_cache=use_cache)
+        if verbose:
+            print(f"  Loaded config: {len(request.agents)} agents")
+        return
+
+    # Создаём конфигурацию по умолчанию
+    default_config = create_default_config(request.project_type)
+
+    # Конвертируем в AgentConfig
+    for agent_data in default_config["agents"]:
+        request.agents.append(AgentConfig(**agent_data))
+
+    if verbose:
+        print(f"  Using default config: {len(request.agents)} agents")
+
+    # Сохраняем конфигурацию для будущего использования
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(config_path, "w") as f:
+        yaml.dump(default_config, f, Dumper=YAML_DUMPER, default_flow_style=False)
+    if verbose:
+        print(f"  Saved config: {config_path}")
+
+
+def load_batch_manifest(manifest_path: Path) -> List[AgentGenerationRequest]:
+    """
+    Загрузить список запросов на генерацию из манифеста
+
+    Поддерживаются YAML (список или ключ `projects`) и JSONL
+    (один проект на строку). Относительные output_dir считаются
+    от директории манифеста.
+    """
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Manifest not found: {manifest_path}")
+
+    if manifest_path.suffix == ".jsonl":
+        entries = [
+            json.loads(line)
+            for line in manifest_path.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+    else:
+        with open(manifest_path) as f:
+            data = yaml.load(f, Loader=YAML_LOADER) or []
+        entries = data.get("projects", []) if isinstance(data, dict) else data
+
+    requests = []
+    for index, entry in enumerate(entries, start=1):
+        try:
+            project_name = entry["project_name"]
+            project_type = entry["project_type"]
+        except KeyError as e:
+            raise ValueError(f"{manifest_path}: entry #{index} is missing {e}") from e
+
+        output_dir = Path(entry.get("output_dir", project_name))
+        if not output_dir.is_absolute():
+            output_dir = manifest_path.parent / output_dir
+
+        requests.append(AgentGenerationRequest(
+            project_name=project_name,
+            project_type=project_type,
+            primary_language=entry.get("language", entry.get("primary_language", "python")),
+            framework=entry.get("framework"),
+            output_dir=output_dir,
+            agents=[AgentConfig(**agent) for agent in entry.get("agents", [])],
+            context=entry.get("context", {})
+        ))
+
+    return requests
+
+
+# Директории, в которые сканирование монорепозитория не спускается
+MONOREPO_SKIP_DIRS = frozenset({
+    "node_modules", "venv", "env", "__pycache__", "site-packages",
+    "dist", "build", "target", "vendor", "bower_components",
+})
+
+
+@dataclass
+class PackageRoot:
+    """Найденный в монорепозитории пакет"""
+    path: Path
+    language: str
+
+
+def detect_package_language(file_names: Set[str]) -> Optional[str]:
+    """Определить основной язык пакета по маркерным файлам директории"""
+    if "go.mod" in file_names:
+        return "go"
+    if "pyproject.toml" in file_names or "setup.py" in file_names:
+        return "python"
+    if "package.json" in file_names:
+        return "typescript" if "tsconfig.json" in file_names else "javascript"
+    return None
+
+
+def _scan_directory(path: Path) -> Tuple[Path, Set[str], List[Path]]:
+    """Прочитать одну директорию: имена файлов и поддиректории для обхода"""
+    file_names: Set[str] = set()
+    subdirs: List[Path] = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if not is_dir:
+                    file_names.add(entry.name)
+                elif not entry.name.startswith(".") and entry.name not in MONOREPO_SKIP_DIRS:
+                    subdirs.append(Path(entry.path))
+    except OSError:
+        pass
+    return path, file_names, subdirs
+
+
+def scan_monorepo(root: Path, workers: Optional[int] = None) -> List[PackageRoot]:
+    """
+    Найти корни пакетов в монорепозитории
+
+    Директории читаются параллельно (os.scandir в пуле потоков), скрытые
+    директории, симлинки и MONOREPO_SKIP_DIRS отсекаются целиком. Вложенные
+    пакеты считаются отдельными шардами; корень репозитория — только если
+    других пакетов нет (обычно это workspace-манифест).
+    """
+    root = Path(root)
+    packages: List[PackageRoot] = []
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(_scan_directory, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, file_names, subdirs = future.result()
+                language = detect_package_language(file_names)
+                if language:
+                    packages.append(PackageRoot(path=path, language=language))
+                pending.update(pool.submit(_scan_directory, subdir) for subdir in subdirs)
+
+    packages.sort(key=lambda package: package.path)
+    if len(packages) > 1:
+        packages = [package for package in packages if package.path != root]
+    return packages
+
+
+def monorepo_requests(
+    packages: List[PackageRoot],
+    project_type: str
+) -> List[AgentGenerationRequest]:
+    """Построить по запросу генерации на каждый пакет монорепозитория"""
+    return [
+        AgentGenerationRequest(
+            project_name=package.path.name,
+            project_type=project_type,
+            primary_language=package.language,
+            output_dir=package.path,
+        )
+        for package in packages
+    ]
+
+
+# Генератор воркера batch-режима (один прогретый Environment на процесс)
+_worker_generator: Optional[AgentGenerator] = None
+_worker_use_cache: bool = True
+
+
+def _init_batch_worker(
+    templates_dir: Optional[Path],
+    use_cache: bool = True,
+    dedup_store: Optional[Path] = None,
+    dedup_hardlinks: bool = False
+) -> None:
+    """Инициализировать воркер пула: создать и прогреть генератор"""
+    global _worker_generator, _worker_use_cache
+    _worker_use_cache = use_cache
+    _worker_generator = AgentGenerator(
+        templates_dir, verbose=False, use_cache=use_cache,
+        dedup_store=dedup_store, dedup_hardlinks=dedup_hardlinks
+    )
+    _worker_generator.warm_up()
+
+
+def _run_batch_job(
+    request: AgentGenerationRequest,
+    format: str,
+    force: bool = False
+) -> BatchResult:
+    """Сгенерировать агентов одного проекта внутри воркера"""
+    result = BatchResult(project_name=request.project_name, output_dir=request.output_dir)
+    start = time.perf_counter()
+    try:
+        resolve_agents(request, verbose=False, use_cache=_worker_use_cache)
+        generated = _worker_generator.generate(request, format=format, force=force)
+        result.agents_count = len(generated)
+        result.skipped_count = len(_worker_generator.last_summary.skipped)
+        result.dedup = _worker_generator.last_summary.dedup
+    except Exception as e:
+        result.error = str(e)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def generate_batch(
+    requests: List[AgentGenerationRequest],
+    jobs: Optional[int] = None,
+    format: str = "claude-code",
+    templates_dir: Optional[Path] = None,
+    use_cache: bool = True,
+    force: bool = False,
+    dedup_store: Optional[Path] = None,
+    dedup_hardlinks: bool = False
+) -> List[BatchResult]:
+    """
+    Сгенерировать агентов для многих проектов в пуле процессов
+
+    Args:
+        requests: Запросы на генерацию
+        jobs: Размер пула (по умолчанию число ядер)
+        format: Формат выходных файлов
+        templates_dir: Директория с шаблонами
+        use_cache: Использовать дисковый кэш скомпилированных шаблонов
+        force: Игнорировать lock-файлы проектов
+        dedup_store: Общее хранилище для дедупликации одинаковых файлов
+        dedup_hardlinks: Связывать файлы с хранилищем hardlink'ами вместо reflink
+
+    Returns:
+        Результаты в порядке requests
+    """
+    results: List[Optional[BatchResult]] = [None] * len(requests)
+
+    with ProcessPoolExecutor(
+        max_workers=jobs or os.cpu_count(),
+        initializer=_init_batch_worker,
+        initargs=(templates_dir, use_cache, dedup_store, dedup_hardlinks)
+    ) as pool:
+        futures = {
+            pool.submit(_run_batch_job, request, format, force): index
+            for index, request in enumerate(requests)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if result.error:
+                print(f"  ✗ {result.project_name} - {result.error}")
+            else:
+                print(f"  ✓ {result.project_name}: {result.agents_count} agent(s), "
+                      f"{result.skipped_count} unchanged ({result.elapsed:.2f}s)")
+
+    return results
+
+
+def print_batch_summary(results: List[BatchResult], wall_time: float) -> None:
+    """Вывести сводку по времени и пропускной способности batch-прогона"""
+    failed = [r for r in results if r.error]
+    agents_total = sum(r.agents_count for r in results)
+    skipped_total = sum(r.skipped_count for r in results)
+    cpu_time = sum(r.elapsed for r in results)
+
+    print()
+    print("  Batch summary")
+    print(f"    Projects:   {len(results)} ({len(results) - len(failed)} ok, {len(failed)} failed)")
+    print(f"    Agents:     {agents_total}")
+    print(f"    Unchanged:  {skipped_total} output(s) skipped via generated.lock")
+    print(f"    Wall time:  {wall_time:.2f}s (sum of project times: {cpu_time:.2f}s)")
+    if wall_time > 0:
+        print(f"    Throughput: {len(results) / wall_time:.1f} projects/s, "
+              f"{agents_total / wall_time:.1f} agents/s")
+
+    dedup = DedupStats()
+    for result in results:
+        if result.dedup:
+            dedup.merge(result.dedup)
+    if dedup.files:
+        print_dedup_stats(dedup)
+
+
+def print_shard_timings(results: List[BatchResult], root: Path, packages: List[PackageRoot]) -> None:
+    """Вывести время генерации по шардам монорепозитория (самые медленные первыми)"""
+    languages = {package.path: package.language for package in packages}
+    rows = [
+        (str(Path(r.output_dir).relative_to(root)) if Path(r.output_dir) != root else ".", r)
+        for r in results
+    ]
+    width = max((len(name) for name, _ in rows), default=5)
+
+    print()
+    print("  Shards (slowest first)")
+    print(f"    {'Package':<{width}}  {'Language':<10}  {'Agents':>6}  {'Time':>9}")
+    for name, r in sorted(rows, key=lambda row: row[1].elapsed, reverse=True):
+        status = f"  FAILED: {r.error}" if r.error else ""
+        print(f"    {name:<{width}}  {languages.get(Path(r.output_dir), '?'):<10}  "
+              f"{r.agents_count:>6}  {r.elapsed * 1000:7.1f}ms{status}")
+
+
+def print_dedup_stats(dedup: DedupStats) -> None:
+    """Вывести статистику дедупликации"""
+    methods = ", ".join(f"{count} {method}" for method, count in sorted(dedup.methods.items()))
+    ratio = f"ratio {dedup.ratio:.1f}x" if dedup.ratio != float("inf") else "no new disk space"
+    print(f"    Dedup:      {dedup.files} file(s), {dedup.logical_bytes} bytes written, "
+          f"{dedup.shared_bytes} bytes shared, {dedup.stored_bytes} bytes new in store "
+          f"({ratio}; {methods})")
+
+
+def print_render_stats(stats: List[RenderStats]) -> None:
+    """Вывести таблицу профиля генерации, отсортированную по общему времени"""
+    print()
+    print("  Render stats (slowest first)")
+    if not stats:
+        print("    No outputs were rendered (all unchanged)")
+        return
+
+    width = max(len(s.output) for s in stats)
+    print(f"    {'Output':<{width}}  {'Context':>9}  {'Render':>9}  {'Write':>9}  "
+          f"{'Bytes':>8}  {'~Tokens':>7}  Template")
+    for s in sorted(stats, key=lambda s: s.total_seconds, reverse=True):
+        print(f"    {s.output:<{width}}  {s.context_seconds * 1000:7.2f}ms  "
+              f"{s.render_seconds * 1000:7.2f}ms  {s.write_seconds * 1000:7.2f}ms  "
+              f"{s.bytes:>8}  {s.tokens:>7}  {s.template}")
+    print(f"    {'TOTAL':<{width}}  {sum(s.context_seconds for s in stats) * 1000:7.2f}ms  "
+          f"{sum(s.render_seconds for s in stats) * 1000:7.2f}ms  "
+          f"{sum(s.write_seconds for s in stats) * 1000:7.2f}ms  "
+          f"{sum(s.bytes for s in stats):>8}  {sum(s.tokens for s in stats):>7}")
+
+
+def write_render_stats_json(
+    path: Path,
+    request: AgentGenerationRequest,
+    summary: GenerationSummary
+) -> None:
+    """Сохранить профиль генерации в JSON (для отслеживания трендов)"""
+    data = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "project_name": request.project_name,
+        "project_type": request.project_type,
+        "primary_language": request.primary_language,
+        "framework": request.framework,
+        "skipped": summary.skipped,
+        "outputs": [
+            dict(asdict(s), tokens=s.tokens, total_seconds=s.total_seconds)
+            for s in summary.stats
+        ],
+    }
+    path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def _run_batch_mode(argv: List[str]) -> int:
+    """Сгенерировать агентов для всех проектов из манифеста"""
+    parser = argparse.ArgumentParser(
+        prog="generate-agents.py --batch",
+        description="Generate agents for many projects listed in a manifest"
+    )
+    parser.add_argument("--batch", required=True, metavar="MANIFEST",
+                        help="YAML or JSONL manifest with project entries")
+    _add_pool_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        clear_template_cache()
+        clear_agents_config_cache()
+
+    requests = load_batch_manifest(Path(args.batch))
+    print("🤖 Agent Generator (batch)")
+    print(f"   Manifest: {args.batch}")
+    print(f"   Projects: {len(requests)}")
+    print()
+
+    start = time.perf_counter()
+    results = _generate_pool(requests, args)
+    print_batch_summary(results, time.perf_counter() - start)
+
+    return 1 if any(r.error for r in results) else 0
+
+
+def _add_pool_arguments(parser: argparse.ArgumentParser) -> None:
+    """Общие опции режимов, генерирующих много проектов в пуле процессов"""
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--format", default="claude-code",
+                        help="Output format (claude-code, cursor, qoder, cliner, all = every format except cursor)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not use the compiled template and agents.yaml caches")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Clear the compiled template and agents.yaml caches before generating")
+    parser.add_argument("--force", action="store_true",
+                        help="Ignore generated.lock and regenerate every output")
+    parser.add_argument("--dedup-store", default=None, metavar="DIR",
+                        help="Shared content store: identical outputs become reflinks of read-only objects "
+                             "(outputs stay unshared where the filesystem has no reflinks)")
+    parser.add_argument("--dedup-hardlinks", action="store_true",
+                        help="Hardlink outputs to store objects instead (outputs become read-only)")
+
+
+def _generate_pool(requests: List[AgentGenerationRequest], args: argparse.Namespace) -> List[BatchResult]:
+    """Запустить generate_batch с опциями из _add_pool_arguments"""
+    return generate_batch(
+        requests, jobs=args.jobs, format=args.format,
+        use_cache=not args.no_cache, force=args.force,
+        dedup_store=Path(args.dedup_store) if args.dedup_store else None,
+        dedup_hardlinks=args.dedup_hardlinks
+    )
+
+
+def _run_monorepo_mode(argv: List[str]) -> int:
+    """Сгенерировать агентов для каждого пакета монорепозитория"""
+    parser = argparse.ArgumentParser(
+        prog="generate-agents.py --monorepo",
+        description="Discover package roots in a monorepo and generate agents for each"
+    )
+    parser.add_argument("--monorepo", required=True, metavar="ROOT",
+                        help="Repository root to scan for packages")
+    parser.add_argument("--type", default="web-service", dest="project_type",
+                        help="Project type used for every package (default: web-service)")
+    parser.add_argument("--scan-workers", type=int, default=None,
+                        help="Threads for the directory scan (default: 4 x CPU count, max 32)")
+    parser.add_argument("--list", action="store_true",
+                        help="Only list detected packages, do not generate")
+    _add_pool_arguments(parser)
+    args = parser.parse_args(argv)
+
+    root = Path(args.monorepo).resolve()
+    if not root.is_dir():
+        print(f"❌ Not a directory: {root}")
+        return 1
+
+    start = time.perf_counter()
+    packages = scan_monorepo(root, workers=args.scan_workers)
+    scan_time = time.perf_counter() - start
+
+    print("🤖 Agent Generator (monorepo)")
+    print(f"   Root: {root}")
+    print(f"   Packages: {len(packages)} (scan {scan_time * 1000:.1f}ms)")
+    if args.list or not packages:
+        for package in packages:
+            print(f"     {package.path.relative_to(root) if package.path != root else '.'}"
+                  f"  [{package.language}]")
+        return 0 if packages else 1
+    print()
+
+    if args.clear_cache:
+        clear_template_cache()
+        clear_agents_config_cache()
+
+    start = time.perf_counter()
+    results = _generate_pool(monorepo_requests(packages, args.project_type), args)
+    wall_time = time.perf_counter() - start
+    print_shard_timings(results, root, packages)
+    print_batch_summary(results, wall_time)
+
+    return 1 if any(r.error for r in results) else 0
+
+
+def _run_profile_mode(argv: List[str]) -> int:
     """Delegate to generate-claude-profile.py for full .claude/ profile generation."""
     import subprocess
 
@@ -744,10 +2005,10 @@ def _run_profile_mode():
 
     if not profile_script.exists():
         print(f"ERROR: {profile_script} not found", file=sys.stderr)
-        sys.exit(1)
+        return 1
 
     # Pass through all args except --profile
-    args = [a for a in sys.argv[1:] if a != "--profile"]
+    args = [a for a in argv if a != "--profile"]
 
     # Add template-dir if not provided
     if "--template-dir" not in args:
@@ -755,41 +2016,241 @@ def _run_profile_mode():
 
     cmd = [sys.executable, str(profile_script)] + args
     result = subprocess.run(cmd)
-    sys.exit(result.returncode)
+    return result.returncode
+
+
+class AgentDaemonHandler(socketserver.StreamRequestHandler):
+    """Обработчик одного запроса к демону: JSON-строка с argv и cwd"""
+
+    def handle(self):
+        try:
+            payload = json.loads(self.rfile.readline())
+            argv = [str(arg) for arg in payload["argv"]]
+            cwd = payload.get("cwd")
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"exit_code": 2, "stdout": "", "stderr": f"ERROR: bad request: {e}\n"}
+        else:
+            response = self.server.execute(argv, cwd)
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+# Ключ пула генераторов демона: (use_cache, путь dedup-хранилища, dedup_hardlinks)
+GeneratorKey = Tuple[bool, Optional[str], bool]
+
+
+class AgentDaemon(socketserver.UnixStreamServer):
+    """
+    Долгоживущий генератор агентов на Unix-сокете
+
+    Держит AgentGenerator'ы (и их Environment с уже скомпилированными
+    шаблонами) между запросами. Запросы обрабатываются последовательно:
+    stdout/stderr и cwd процесса подменяются на время каждого запроса.
+    """
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+        self.generators: Dict[GeneratorKey, AgentGenerator] = {}
+        super().__init__(str(socket_path), AgentDaemonHandler)
+
+    def execute(self, argv: List[str], cwd: Optional[str]) -> Dict[str, Any]:
+        """Выполнить команду generate-agents так же, как CLI в отдельном процессе"""
+        if "--serve" in argv or "--profile" in argv:
+            return {
+                "exit_code": 2,
+                "stdout": "",
+                "stderr": "ERROR: --serve and --profile are not available through the daemon\n"
+            }
+
+        previous_cwd = os.getcwd()
+        if cwd:
+            try:
+                os.chdir(cwd)
+            except OSError as e:
+                # Каталог клиента удалён или недоступен: ответить ошибкой, а не рвать соединение
+                return {"exit_code": 2, "stdout": "",
+                        "stderr": f"ERROR: cannot enter working directory {cwd}: {e}\n"}
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    exit_code = run_cli(argv, self.generators)
+                except SystemExit as e:
+                    exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                except Exception as e:
+                    print(f"ERROR: {e}", file=sys.stderr)
+                    exit_code = 1
+        finally:
+            os.chdir(previous_cwd)
+
+        return {"exit_code": exit_code, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def _daemon_is_alive(socket_path: Path) -> bool:
+    """Проверить, принимает ли кто-то соединения на сокете"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def _run_serve_mode(argv: List[str]) -> int:
+    """Запустить демон генерации агентов"""
+    parser = argparse.ArgumentParser(
+        prog="generate-agents.py --serve",
+        description="Keep AgentGenerator warm and serve generation requests over a Unix socket"
+    )
+    parser.add_argument("--serve", action="store_true", required=True)
+    parser.add_argument("--socket", default=None,
+                        help="Socket path (default: $CODEFOUNDRY_AGENTS_SOCKET or a per-user path)")
+    args = parser.parse_args(argv)
+
+    socket_path = Path(args.socket) if args.socket else default_socket_path()
+    socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if socket_path.exists():
+        if _daemon_is_alive(socket_path):
+            print(f"ERROR: daemon already listening on {socket_path}", file=sys.stderr)
+            return 1
+        socket_path.unlink()
+
+    daemon = AgentDaemon(socket_path)
+    os.chmod(socket_path, 0o600)
+
+    # Прогреваем генератор по умолчанию до первого запроса
+    daemon.generators[(True, None, False)] = AgentGenerator()
+    templates = daemon.generators[(True, None, False)].warm_up()
+
+    def _stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"🤖 Agent Generator daemon: {templates} templates warm, listening on {socket_path}",
+          flush=True)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.server_close()
+        if socket_path.exists():
+            socket_path.unlink()
+    return 0
+
+
+def _pop_flag(argv: List[str], flag: str) -> bool:
+    """Удалить флаг из argv; вернуть True, если он был передан"""
+    if flag in argv:
+        argv.remove(flag)
+        return True
+    return False
+
+
+def _pop_option(argv: List[str], option: str, default: Optional[str] = None) -> Optional[str]:
+    """Удалить опцию со значением из argv; вернуть значение или default"""
+    if option in argv:
+        index = argv.index(option)
+        if index + 1 >= len(argv):
+            print(f"ERROR: {option} requires a value", file=sys.stderr)
+            sys.exit(1)
+        value = argv[index + 1]
+        del argv[index:index + 2]
+        return value
+    return default
+
+
+def _get_generator(
+    generators: Optional[Dict[GeneratorKey, AgentGenerator]],
+    use_cache: bool,
+    dedup_store: Optional[str] = None,
+    dedup_hardlinks: bool = False
+) -> AgentGenerator:
+    """Взять генератор из пула демона или создать новый"""
+    store = Path(dedup_store).resolve() if dedup_store else None
+    if generators is None:
+        return AgentGenerator(use_cache=use_cache, dedup_store=store, dedup_hardlinks=dedup_hardlinks)
+    key = (use_cache, str(store) if store else None, dedup_hardlinks)
+    if key not in generators:
+        generators[key] = AgentGenerator(
+            use_cache=use_cache, dedup_store=store, dedup_hardlinks=dedup_hardlinks
+        )
+    return generators[key]
 
 
 # CLI interface
-def main():
-    """CLI для генерации агентов"""
+def run_cli(argv: List[str], generators: Optional[Dict[GeneratorKey, AgentGenerator]] = None) -> int:
+    """
+    Выполнить команду generate-agents
 
-    # Check for --profile mode
-    if "--profile" in sys.argv:
-        _run_profile_mode()
-        return
+    Args:
+        argv: Аргументы командной строки (без имени скрипта)
+        generators: Пул переиспользуемых генераторов (используется демоном)
 
-    if len(sys.argv) < 3:
+    Returns:
+        Код возврата
+    """
+
+    # Check for --profile mode
+    if "--profile" in argv:
+        return _run_profile_mode(argv)
+
+    # Check for --batch mode
+    if "--batch" in argv:
+        return _run_batch_mode(argv)
+
+    # Check for --monorepo mode
+    if "--monorepo" in argv:
+        return _run_monorepo_mode(argv)
+
+    # Check for --serve mode
+    if "--serve" in argv:
+        return _run_serve_mode(argv)
+
+    argv = list(argv)
+    use_cache = not _pop_flag(argv, "--no-cache")
+    clear_cache = _pop_flag(argv, "--clear-cache")
+    force = _pop_flag(argv, "--force")
+    output_format = _pop_option(argv, "--format", "claude-code")
+    stats_json = _pop_option(argv, "--stats-json")
+    dedup_store = _pop_option(argv, "--dedup-store")
+    dedup_hardlinks = _pop_flag(argv, "--dedup-hardlinks")
+    show_stats = _pop_flag(argv, "--stats") or stats_json is not None
+
+    if len(argv) < 2:
         print("Usage:")
-        print("  generate-agents.py <project_name> <project_type> [language] [framework] [output_dir]")
+        print("  generate-agents.py <project_name> <project_type> [language] [framework] [output_dir]"
+              " [--format claude-code|cursor|qoder|cliner|all]"
+              " [--no-cache] [--clear-cache] [--force] [--stats] [--stats-json FILE]"
+              " [--dedup-store DIR [--dedup-hardlinks]]")
         print("  generate-agents.py --profile --archetype <type> --project-name <name> --project-dir <dir>")
+        print("  generate-agents.py --batch <manifest.yaml|manifest.jsonl> [--jobs N]")
+        print("  generate-agents.py --monorepo <root> [--type TYPE] [--jobs N] [--list]")
+        print("  generate-agents.py --serve [--socket PATH]")
         print("")
         print("Examples:")
         print("  generate-agents.py MyBot telegram-bot python aiogram /workspace/MyBot")
         print("  generate-agents.py --profile --archetype web-service --project-name my-api --project-dir ./my-api")
-        sys.exit(1)
-
-    project_name = sys.argv[1]
-    project_type = sys.argv[2]
-    language = sys.argv[3] if len(sys.argv) > 3 else "python"
-    framework = sys.argv[4] if len(sys.argv) > 4 else None
-    output_dir = Path(sys.argv[5]) if len(sys.argv) > 5 else Path.cwd()
-
-    print(f"🤖 Agent Generator")
+        print("  generate-agents.py --batch workspaces.yaml --jobs 8")
+        print("  generate-agents.py --monorepo . --type web-service --jobs 8")
+        print("  generate-agents-client.py MyBot telegram-bot python aiogram  # via --serve daemon")
+        return 1
+
+    project_name = argv[0]
+    project_type = argv[1]
+    language = argv[2] if len(argv) > 2 else "python"
+    framework = argv[3] if len(argv) > 3 else None
+    output_dir = Path(argv[4]) if len(argv) > 4 else Path.cwd()
+
+    print("🤖 Agent Generator")
     print(f"   Project: {project_name}")
     print(f"   Type: {project_type}")
     print(f"   Language: {language}")
     if framework:
         print(f"   Framework: {framework}")
     print(f"   Output: {output_dir}")
+    if output_format != "claude-code":
+        print(f"   Format: {output_format}")
     print()
 
     # Создаём запрос
@@ -801,44 +2262,44 @@ def main():
         output_dir=output_dir
     )
 
-    # Загружаем конфигурацию агентов
-    config_path = output_dir / ".codefoundry" / "agents.yaml"
-    if config_path.exists():
-        request.agents = load_agents_config(config_path)
-        print(f"  Loaded config: {len(request.agents)} agents")
-    else:
-        # Создаём конфигурацию по умолчанию
-        default_config = create_default_config(project_type)
-        config_data = default_config
-
-        # Конвертируем в AgentConfig
-        for agent_data in config_data["agents"]:
-            request.agents.append(AgentConfig(**agent_data))
+    if clear_cache:
+        clear_template_cache()
+        clear_agents_config_cache()
 
-        print(f"  Using default config: {len(request.agents)} agents")
-
-        # Сохраняем конфигурацию для будущего использования
-        config_dir = output_dir / ".codefoundry"
-        config_dir.mkdir(parents=True, exist_ok=True)
-        with open(config_path, "w") as f:
-            yaml.dump(default_config, f, default_flow_style=False)
-        print(f"  Saved config: {config_path}")
+    # Загружаем конфигурацию агентов
+    resolve_agents(request, use_cache=use_cache)
 
     print()
     print("  Generating agents...")
 
     # Генерируем агентов
-    generator = AgentGenerator()
-    generated = generator.generate(request, format="claude-code")
+    generator = _get_generator(generators, use_cache, dedup_store, dedup_hardlinks)
+    generated = generator.generate(request, format=output_format, force=force)
+    summary = generator.last_summary
 
     print()
-    print(f"  ✓ Generated {len(generated)} agent(s)")
-    print(f"  ✓ Orchestration: AGENTS.md")
+    agents_count = len({key.rsplit(":", 1)[-1] for key in generated})
+    print(f"  ✓ Generated {agents_count} agent(s)")
+    print(f"  ✓ Outputs: {len(summary.regenerated)} regenerated, {len(summary.skipped)} unchanged")
+    if summary.dedup.files:
+        print_dedup_stats(summary.dedup)
+    if show_stats:
+        print_render_stats(summary.stats)
+        if stats_json:
+            write_render_stats_json(Path(stats_json), request, summary)
+            print(f"  ✓ Stats saved: {stats_json}")
+    print("  ✓ Orchestration: AGENTS.md")
     print()
-    print(f"  Next steps:")
+    print("  Next steps:")
     print(f"    1. Review generated files in {output_dir}/.claude/")
-    print(f"    2. Customize agent prompts for your project")
-    print(f"    3. Test agent routing with Claude Code")
+    print("    2. Customize agent prompts for your project")
+    print("    3. Test agent routing with Claude Code")
+    return 0
+
+
+def main():
+    """CLI для генерации агентов"""
+    sys.exit(run_cli(sys.argv[1:]))
 
 
 if __name__ == "__main__":
@@ -5,22 +5,42 @@ Generate .claude/ profile for a new project.
 Merges base profile templates with archetype-specific overlays,
 renders Jinja2 templates, and writes to the target project directory.
 
+Precompiled per-archetype bundles (zip of compiled templates plus
+bundle.json with the manifest, output map and source hash) are used when
+fresh; otherwise templates are compiled from source.
+
 Usage:
     python3 generate-claude-profile.py --archetype web-service \
         --project-name my-api --project-dir /path/to/my-api \
         --template-dir /path/to/templates/claude-profile
+
+    python3 generate-claude-profile.py --build-bundles \
+        --template-dir /path/to/templates/claude-profile
 """
 
 import argparse
+import glob
+import hashlib
+import re
+import time
+import importlib.util
 import json
+import marshal
 import os
 import shutil
 import stat
 import sys
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 try:
-    from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+    import jinja2
+    from jinja2 import (
+        ChoiceLoader, Environment, FileSystemLoader, ModuleLoader, TemplateNotFound, Undefined, meta,
+    )
 except ImportError:
     print("ERROR: jinja2 not installed. Run: pip3 install jinja2", file=sys.stderr)
     sys.exit(1)
@@ -33,7 +53,10 @@ def load_manifest(overlay_dir: Path) -> dict:
         print(f"WARNING: No manifest.json in {overlay_dir}", file=sys.stderr)
         return {}
     with open(manifest_path) as f:
-        return json.load(f)
+        manifest = json.load(f)
+    if "token_budgets" in manifest:
+        validate_token_budgets(manifest["token_budgets"], manifest_path)
+    return manifest
 
 
 def merge_agents(base_agents: list[str], manifest: dict) -> list[str]:
@@ -61,6 +84,19 @@ def merge_lists(base: list[str], manifest: dict, key: str) -> list[str]:
     return result
 
 
+BASE_AGENTS = ["coordinator", "code-assistant", "reviewer", "tester"]
+BASE_SKILLS = ["validate"]
+BASE_COMMANDS = ["health"]
+
+
+def merge_components(manifest: dict) -> tuple[list[str], list[str], list[str]]:
+    """Merge base agents/skills/commands with the overlay manifest."""
+    agents = merge_agents(BASE_AGENTS, manifest)
+    skills = merge_lists(BASE_SKILLS, manifest, "skills")
+    commands = merge_lists(BASE_COMMANDS, manifest, "commands")
+    return agents, skills, commands
+
+
 def build_routing_overrides(manifest: dict) -> list[dict]:
     """Convert manifest routing overrides to template-friendly format."""
     routing = manifest.get("routing", {})
@@ -101,105 +137,528 @@ def _lang_ext(lang: str) -> str:
     }.get(lang, "py")
 
 
-def render_templates(template_dir: Path, output_dir: Path,
-                     template_vars: dict, subdirs: list[str]):
-    """Render all .j2 templates from template_dir into output_dir."""
-    env = Environment(
-        loader=FileSystemLoader(str(template_dir)),
+SUBDIRS = ["agents", "skills", "commands", "hooks"]
+
+# Subdirectories whose *.md outputs are filtered by the merged component lists
+FILTERED_SUBDIRS = ("agents", "skills", "commands")
+
+
+def create_environment(layers: list[tuple[str, Path]]) -> Environment:
+    """
+    Create one Environment over all template layers.
+
+    Layers are given bottom-up (base, shared, overlay); the loader searches
+    them top-down, so a template name resolves to the highest layer that
+    defines it.
+    """
+    return Environment(
+        loader=ChoiceLoader([FileSystemLoader(str(path)) for _, path in reversed(layers)]),
         keep_trailing_newline=True,
-        undefined=__import__('jinja2').Undefined,
+        undefined=Undefined,
     )
 
-    for subdir in subdirs:
-        src = template_dir / subdir
-        if not src.exists():
-            continue
 
-        for template_file in src.rglob("*.j2"):
-            rel_path = template_file.relative_to(template_dir)
-            # Remove .j2 extension for output
-            out_path = output_dir / str(rel_path).removesuffix(".j2")
+def resolve_outputs(layers: list[tuple[str, Path]], subdirs: list[str],
+                    allowed: dict[str, list[str]]) -> dict[str, tuple[str, str]]:
+    """
+    Resolve the layer stack into a single output map.
 
-            out_path.parent.mkdir(parents=True, exist_ok=True)
+    Returns {output path relative to the project dir: (template name, layer)}.
+    Root-level base templates go to .claude/ (CLAUDE.md to the project root);
+    subdir templates from upper layers replace lower ones. Agents, skills and
+    commands missing from the merged lists are dropped before rendering.
+    """
+    outputs: dict[str, tuple[str, str]] = {}
 
-            try:
-                tmpl = env.get_template(str(rel_path))
-                rendered = tmpl.render(**template_vars)
-                out_path.write_text(rendered)
+    layer_name, base_dir = layers[0]
+    for template_file in sorted(base_dir.glob("*.j2")):
+        out_name = template_file.name.removesuffix(".j2")
+        out_rel = out_name if out_name == "CLAUDE.md" else f".claude/{out_name}"
+        outputs[out_rel] = (template_file.name, layer_name)
+
+    for layer_name, layer_dir in layers:
+        for subdir in subdirs:
+            src = layer_dir / subdir
+            if not src.exists():
+                continue
+            for template_file in sorted(src.rglob("*.j2")):
+                name = template_file.relative_to(layer_dir).as_posix()
+                outputs[f".claude/{name.removesuffix('.j2')}"] = (name, layer_name)
+
+    def is_allowed(out_rel: str) -> bool:
+        parts = out_rel.split("/")
+        if len(parts) != 3 or parts[1] not in allowed or not parts[2].endswith(".md"):
+            return True
+        return parts[2].removesuffix(".md") in allowed[parts[1]]
+
+    return {out_rel: source for out_rel, source in outputs.items() if is_allowed(out_rel)}
+
+
+def profile_layers(template_dir: Path, archetype: str) -> list[tuple[str, Path]]:
+    """Return the existing template layers for an archetype, bottom-up."""
+    layers = [("base", template_dir / "base")]
+    shared_dir = template_dir / "shared"
+    overlay_dir = template_dir / "overlays" / archetype
+    if shared_dir.exists():
+        layers.append(("shared", shared_dir))
+    if overlay_dir.exists():
+        layers.append(("overlay", overlay_dir))
+    return layers
 
-                # Make hooks executable
-                if "hooks" in str(out_path) and out_path.suffix == ".sh":
-                    out_path.chmod(out_path.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP)
 
-            except Exception as e:
-                print(f"WARNING: Failed to render {rel_path}: {e}", file=sys.stderr)
+# --- Precompiled bundles ---
 
+BUNDLE_FORMAT = 2
+BUNDLE_META = "bundle.json"
 
-def render_root_templates(template_dir: Path, output_dir: Path, template_vars: dict):
-    """Render root-level .j2 files (CLAUDE.md, settings.json, routing rules)."""
-    env = Environment(
-        loader=FileSystemLoader(str(template_dir)),
-        keep_trailing_newline=True,
-        undefined=__import__('jinja2').Undefined,
-    )
 
-    for template_file in template_dir.glob("*.j2"):
-        rel_path = template_file.relative_to(template_dir)
-        out_name = template_file.name.removesuffix(".j2")
+def default_cache_dir() -> Path:
+    """CodeFoundry cache directory ($CODEFOUNDRY_CACHE_DIR or $XDG_CACHE_HOME/codefoundry)."""
+    if env_dir := os.environ.get("CODEFOUNDRY_CACHE_DIR"):
+        return Path(env_dir)
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache) / "codefoundry"
 
-        # CLAUDE.md goes to project root, others go to .claude/
-        if out_name == "CLAUDE.md":
-            out_path = output_dir.parent / out_name  # project root
-        else:
-            out_path = output_dir / out_name  # .claude/
 
-        out_path.parent.mkdir(parents=True, exist_ok=True)
+def default_bundle_dir() -> Path:
+    """Default location for precompiled profile bundles."""
+    return default_cache_dir() / "profile-bundles"
+
+
+def source_hash(layers: list[tuple[str, Path]]) -> str:
+    """
+    Hash everything a bundle is built from.
 
+    Covers every file in the layers (templates and manifest.json), this
+    script (output resolution rules), the Jinja2 version that compiled it and
+    the Python bytecode version of the modules inside the bundle.
+    """
+    digest = hashlib.sha256(f"format={BUNDLE_FORMAT} jinja2={jinja2.__version__}\n".encode())
+    digest.update(importlib.util.MAGIC_NUMBER)
+    digest.update(Path(__file__).read_bytes())
+    for layer_name, layer_dir in layers:
+        files = []
+        for root, dirs, names in os.walk(layer_dir):
+            dirs.sort()
+            files.extend(Path(root) / name for name in sorted(names))
+        for path in files:
+            digest.update(f"\0{layer_name}/{path.relative_to(layer_dir).as_posix()}\0".encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def build_bundle(template_dir: Path, archetype: str, bundle_dir: Path) -> Path:
+    """Precompile an archetype's resolved template set into <bundle_dir>/<archetype>.zip."""
+    layers = profile_layers(template_dir, archetype)
+    overlay_dir = template_dir / "overlays" / archetype
+    manifest = load_manifest(overlay_dir) if overlay_dir.exists() else {}
+    agents, skills, commands = merge_components(manifest)
+    outputs = resolve_outputs(layers, SUBDIRS,
+                              {"agents": agents, "skills": skills, "commands": commands})
+
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    bundle_path = bundle_dir / f"{archetype}.zip"
+    fd, tmp_path = tempfile.mkstemp(dir=bundle_dir, prefix=f".{archetype}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        env = create_environment(layers)
+        analyzer = RenderCache(None)
+        bundle_meta = {
+            "format": BUNDLE_FORMAT,
+            "archetype": archetype,
+            "source_hash": source_hash(layers),
+            "manifest": manifest,
+            "outputs": outputs,
+            "dependencies": {
+                name: analyzer.dependencies(env, name) for name, _ in outputs.values()
+            },
+        }
+        with tempfile.TemporaryDirectory() as compiled_dir, \
+                zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+            env.compile_templates(compiled_dir, filter_func=lambda name: name.endswith(".j2"),
+                                  zip=None, ignore_errors=False)
+            # Store sourceless .pyc so that zipimport does not recompile on every load
+            for module_file in sorted(Path(compiled_dir).glob("*.py")):
+                code = compile(module_file.read_text(encoding="utf-8"), module_file.name, "exec")
+                header = importlib.util.MAGIC_NUMBER + bytes(12)
+                bundle.writestr(f"{module_file.stem}.pyc", header + marshal.dumps(code))
+            bundle.writestr(BUNDLE_META, json.dumps(bundle_meta, indent=2))
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return bundle_path
+
+
+def build_bundles(template_dir: Path, bundle_dir: Path, archetypes: list[str]) -> int:
+    """Build bundles for the given archetypes; return the number of failures."""
+    failures = 0
+    for archetype in archetypes:
         try:
-            tmpl = env.get_template(str(rel_path))
-            rendered = tmpl.render(**template_vars)
-            out_path.write_text(rendered)
+            path = build_bundle(template_dir, archetype, bundle_dir)
+            print(f"Built profile bundle: {path}")
         except Exception as e:
-            print(f"WARNING: Failed to render {rel_path}: {e}", file=sys.stderr)
-
+            failures += 1
+            print(f"ERROR: Failed to build bundle for '{archetype}': {e}", file=sys.stderr)
+    return failures
+
+
+def load_bundle(bundle_dir: Path, archetype: str,
+                layers: list[tuple[str, Path]]) -> tuple[Environment, dict] | None:
+    """
+    Load a precompiled bundle if it exists and matches the current sources.
+
+    Returns (environment over the compiled templates, bundle metadata), or
+    None when the caller should compile from source.
+    """
+    bundle_path = bundle_dir / f"{archetype}.zip"
+    if not bundle_path.exists():
+        return None
+    try:
+        with zipfile.ZipFile(bundle_path) as bundle:
+            bundle_meta = json.loads(bundle.read(BUNDLE_META))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        print(f"WARNING: Unreadable profile bundle {bundle_path}, using templates",
+              file=sys.stderr)
+        return None
 
-def copy_overlay_templates(overlay_dir: Path, output_dir: Path,
-                           template_vars: dict, subdirs: list[str]):
-    """Render overlay-specific templates into the output directory."""
-    if not overlay_dir.exists():
-        return
+    if (bundle_meta.get("format") != BUNDLE_FORMAT
+            or bundle_meta.get("source_hash") != source_hash(layers)):
+        print(f"NOTE: Profile bundle for '{archetype}' is stale, using templates "
+              f"(rebuild with --build-bundles)", file=sys.stderr)
+        return None
 
     env = Environment(
-        loader=FileSystemLoader(str(overlay_dir)),
+        loader=ModuleLoader(str(bundle_path)),
         keep_trailing_newline=True,
-        undefined=__import__('jinja2').Undefined,
+        undefined=Undefined,
     )
+    bundle_meta["outputs"] = {
+        out_rel: tuple(source) for out_rel, source in bundle_meta["outputs"].items()
+    }
+    return env, bundle_meta
+
+
+# --- Render cache ---
+
+RENDER_CACHE_FORMAT = 2
+
+# On-disk size cap; least recently used entries are evicted down to 3/4 of it
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Environment settings that change how a template parses or renders
+ENVIRONMENT_OPTIONS = (
+    "block_start_string", "block_end_string", "variable_start_string", "variable_end_string",
+    "comment_start_string", "comment_end_string", "line_statement_prefix", "line_comment_prefix",
+    "trim_blocks", "lstrip_blocks", "newline_sequence", "keep_trailing_newline", "optimized",
+    "autoescape", "undefined", "finalize",
+)
+
+# Placeholder for variables a template reads but build_template_vars does not set
+_UNDEFINED = "\0undefined"
+
+
+def _write_atomic(path: Path, text: str):
+    """Write text through a temp file and rename, so readers never see partial data."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _qualified_name(value) -> str:
+    """JSON fallback for Environment options that are classes or callables."""
+    name = getattr(value, "__qualname__", None)
+    return f"{value.__module__}.{name}" if name else repr(value)
+
+
+class RenderCache:
+    """
+    On-disk cache of rendered outputs keyed by what a template can see.
+
+    The key is the hash of the template and everything it includes, plus
+    the values of only the variables it reads (find_undeclared_variables).
+    Outputs that do not mention project_name are therefore shared by all
+    projects of an archetype. The per-template analysis is itself cached by
+    source hash, so templates are parsed once, not once per project.
+
+    Renders are also memoized in memory for the lifetime of the instance,
+    so one cache shared by concurrent archetype renders renders each
+    identical output once; concurrent requests for a key wait for the
+    first render.
+
+    Both keys also cover the Environment settings (ENVIRONMENT_OPTIONS and
+    extensions). The directory is kept under max_bytes by evicting the
+    least recently used files (hits refresh the mtime).
+    """
+
+    def __init__(self, cache_dir: Path | None, max_bytes: int = RENDER_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Cache root; None keeps everything in memory only
+            max_bytes: Size cap of the on-disk cache
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._dependencies: dict[tuple[Environment, str], tuple[str, list[str]] | None] = {}
+        self._environment_keys: dict[Environment, str] = {}
+        self._renders: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._disk_bytes: int | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def environment_key(self, env: Environment) -> str:
+        """Hash of the Environment settings that affect parsing and rendering."""
+        if env not in self._environment_keys:
+            options = {name: getattr(env, name) for name in ENVIRONMENT_OPTIONS}
+            options["extensions"] = sorted(env.extensions)
+            self._environment_keys[env] = hashlib.sha256(json.dumps(
+                options, sort_keys=True, default=_qualified_name,
+            ).encode("utf-8")).hexdigest()
+        return self._environment_keys[env]
+
+    def register(self, env: Environment, dependencies: dict):
+        """Use precomputed {template: [hash, variables] or None} (from a bundle) for env."""
+        for name, dependency in dependencies.items():
+            self._dependencies[(env, name)] = tuple(dependency) if dependency else None
+
+    def _analyze(self, env: Environment,
+                 name: str) -> tuple[str, list[str], list[str] | None, str | None]:
+        """
+        Return (source hash, own variables, referenced templates or None if
+        dynamic, file the loader resolved the name to).
+        """
+        source, filename, _ = env.loader.get_source(env, name)
+        source_digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        analysis_path = None
+        if self.cache_dir is not None:
+            analysis_key = hashlib.sha256(
+                f"{self.environment_key(env)}:{source_digest}".encode()).hexdigest()
+            analysis_path = self.cache_dir / "analysis" / f"{analysis_key}.json"
+            try:
+                data = json.loads(analysis_path.read_text(encoding="utf-8"))
+                return source_digest, data["variables"], data["references"], filename
+            except (OSError, ValueError, KeyError):
+                pass
+
+        ast = env.parse(source)
+        references = list(meta.find_referenced_templates(ast))
+        data = {
+            "variables": sorted(meta.find_undeclared_variables(ast)),
+            "references": None if None in references else sorted(references),
+        }
+        if analysis_path is not None:
+            self._store(analysis_path, json.dumps(data))
+        return source_digest, data["variables"], data["references"], filename
+
+    def _resolve(self, env: Environment, name: str,
+                 seen: set[str]) -> tuple[str, list[str]] | None:
+        seen.add(name)
+        source_digest, variables, references, _ = self._analyze(env, name)
+        if references is None:
+            return None
+        digest = hashlib.sha256(source_digest.encode())
+        all_variables = set(variables)
+        for reference in references:
+            if reference in seen:
+                continue
+            dependency = self._resolve(env, reference, seen)
+            if dependency is None:
+                return None
+            digest.update(dependency[0].encode())
+            all_variables.update(dependency[1])
+        return digest.hexdigest(), sorted(all_variables)
+
+    def dependencies(self, env: Environment, name: str) -> tuple[str, list[str]] | None:
+        """
+        Return (hash of template and includes, variables it reads).
+
+        None means the output cannot be cached: a dynamic include, or no
+        source access (compiled bundle without precomputed dependencies).
+        """
+        if (env, name) not in self._dependencies:
+            try:
+                dependency = self._resolve(env, name, set())
+            except (TemplateNotFound, RuntimeError, TypeError):
+                dependency = None
+            self._dependencies[(env, name)] = dependency
+        return self._dependencies[(env, name)]
+
+    def source_files(self, env: Environment, name: str) -> set[Path] | None:
+        """
+        Return the files a template renders from: itself plus everything it
+        includes, extends or imports, as resolved through the layered loader.
+
+        None means the set is unknown (dynamic reference).
+        """
+        files: set[Path] = set()
+        pending, seen = [name], set()
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            _, _, references, filename = self._analyze(env, current)
+            if references is None:
+                return None
+            if filename:
+                files.add(Path(filename).resolve())
+            pending.extend(references)
+        return files
+
+    def render(self, env: Environment, name: str, template_vars: dict) -> str:
+        """Render a template, reusing an output rendered from the same inputs."""
+        dependency = self.dependencies(env, name)
+        if dependency is None:
+            return env.get_template(name).render(**template_vars)
+
+        template_hash, variables = dependency
+        values = {variable: template_vars.get(variable, _UNDEFINED) for variable in variables}
+        key = hashlib.sha256(json.dumps(
+            [RENDER_CACHE_FORMAT, jinja2.__version__, self.environment_key(env), template_hash, values],
+            sort_keys=True, default=repr,
+        ).encode("utf-8")).hexdigest()
+
+        with self._lock:
+            future = self._renders.get(key)
+            owner = future is None
+            if owner:
+                future = self._renders[key] = Future()
+            else:
+                self.hits += 1
+        if not owner:
+            return future.result()
 
-    for subdir in subdirs:
-        src = overlay_dir / subdir
-        if not src.exists():
-            continue
-
-        for template_file in src.rglob("*.j2"):
-            rel_path = template_file.relative_to(overlay_dir)
-            out_path = output_dir / str(rel_path).removesuffix(".j2")
-
-            out_path.parent.mkdir(parents=True, exist_ok=True)
-
+        try:
+            rendered = self._render_uncached(env, name, template_vars, key)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(rendered)
+        return rendered
+
+    def _render_uncached(self, env: Environment, name: str, template_vars: dict,
+                         key: str) -> str:
+        """Render from the on-disk cache or the template (first request for a key)."""
+        output_path = None
+        if self.cache_dir is not None:
+            output_path = self.cache_dir / "outputs" / key[:2] / key
             try:
-                tmpl = env.get_template(str(rel_path))
-                rendered = tmpl.render(**template_vars)
-                out_path.write_text(rendered)
+                with open(output_path, encoding="utf-8", newline="") as f:
+                    rendered = f.read()
+                os.utime(output_path)
+                with self._lock:
+                    self.hits += 1
+                return rendered
+            except OSError:
+                pass
+
+        rendered = env.get_template(name).render(**template_vars)
+        if output_path is not None:
+            self._store(output_path, rendered)
+        with self._lock:
+            self.misses += 1
+        return rendered
+
+    def _store(self, path: Path, text: str):
+        """Write a cache file and evict old entries once the cache outgrows max_bytes."""
+        _write_atomic(path, text)
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._disk_bytes += len(text.encode("utf-8"))
+            if self._disk_bytes > self.max_bytes:
+                self._disk_bytes = self.prune(self.max_bytes * 3 // 4)
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """(mtime, size, path) of every cached file."""
+        entries = []
+        for subdir in ("outputs", "analysis"):
+            for path in (self.cache_dir / subdir).rglob("*"):
+                try:
+                    info = path.stat()
+                except OSError:
+                    continue  # Evicted by a concurrent run
+                if stat.S_ISREG(info.st_mode):
+                    entries.append((info.st_mtime, info.st_size, path))
+        return entries
+
+    def prune(self, target_bytes: int) -> int:
+        """Delete least recently used files until the cache fits target_bytes; return its size."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+def render_output(env: Environment, name: str, layer: str, template_vars: dict,
+                  cache: RenderCache | None = None) -> tuple[str | None, str | None]:
+    """Render one output in memory; return (text or None, warning or None)."""
+    try:
+        if cache is not None:
+            return cache.render(env, name, template_vars), None
+        return env.get_template(name).render(**template_vars), None
+    except Exception as e:
+        kind = "" if layer == "base" else f"{layer} "
+        return None, f"WARNING: Failed to render {kind}{name}: {e}"
+
+
+def _map(function, items: list, jobs: int) -> list:
+    """Map in a bounded thread pool when jobs > 1, keeping input order."""
+    if jobs > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+            return list(pool.map(function, items))
+    return [function(item) for item in items]
+
+
+def render_tree(env: Environment, outputs: dict[str, tuple[str, str]], template_vars: dict,
+                jobs: int = 1, cache: RenderCache | None = None) -> dict[str, str]:
+    """
+    Render every resolved output exactly once into an in-memory tree.
+
+    Returns {output path relative to the project dir: text}. Failed renders
+    are left out of the tree; warnings are printed in output-map order.
+    """
+    results = _map(lambda source: render_output(env, *source, template_vars, cache),
+                   list(outputs.values()), jobs)
+
+    tree = {}
+    for out_rel, (rendered, warning) in zip(outputs, results):
+        if warning:
+            print(warning, file=sys.stderr)
+        else:
+            tree[out_rel] = rendered
+    return tree
 
-                if "hooks" in str(out_path) and out_path.suffix == ".sh":
-                    out_path.chmod(out_path.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP)
 
-            except Exception as e:
-                print(f"WARNING: Failed to render overlay {rel_path}: {e}", file=sys.stderr)
+def agent_description(text: str) -> str:
+    """Extract the first non-heading line of an agent file (its role summary)."""
+    for line in text.splitlines():
+        if line.startswith("## Role"):
+            continue
+        if line.strip() and not line.startswith("#"):
+            return line.strip()
+    return ""
 
 
-def generate_agents_md(output_dir: Path, agents: list[str], project_name: str):
-    """Generate AGENTS.md registry file listing all agents."""
+def build_agents_md(agents: list[str], project_name: str, descriptions: dict[str, str]) -> str:
+    """Build the AGENTS.md registry listing all agents."""
     lines = [
         f"# Agents Registry — {project_name}\n",
         "",
@@ -207,72 +666,316 @@ def generate_agents_md(output_dir: Path, agents: list[str], project_name: str):
         "|-------|------|-------------|",
     ]
     for agent in agents:
-        agent_file = output_dir / "agents" / f"{agent}.md"
-        desc = ""
-        if agent_file.exists():
-            # Extract first heading after "## Role"
-            for line in agent_file.read_text().splitlines():
-                if line.startswith("## Role"):
-                    continue
-                if line.strip() and not line.startswith("#"):
-                    desc = line.strip()
-                    break
-        lines.append(f"| {agent} | `agents/{agent}.md` | {desc} |")
+        lines.append(f"| {agent} | `agents/{agent}.md` | {descriptions.get(agent, '')} |")
 
     lines.append("")
-    (output_dir / "AGENTS.md").write_text("\n".join(lines))
+    return "\n".join(lines)
 
 
-def _cleanup_extra_files(directory: Path, allowed_names: list[str], ext: str):
-    """Remove files from directory that aren't in the allowed list."""
-    if not directory.exists():
-        return
-    allowed = {f"{name}{ext}" for name in allowed_names}
-    for f in directory.glob(f"*{ext}"):
-        if f.name not in allowed:
-            f.unlink()
-
-
-def main():
-    parser = argparse.ArgumentParser(description="Generate .claude/ profile for a project")
-    parser.add_argument("--archetype", required=True, help="Archetype name")
-    parser.add_argument("--project-name", required=True, help="Project name")
-    parser.add_argument("--project-dir", required=True, help="Project directory path")
-    parser.add_argument("--template-dir", required=True, help="Claude profile templates directory")
-    parser.add_argument("--language", default=None, help="Primary language override")
-    parser.add_argument("--project-description", default=None, help="Project description")
-    args = parser.parse_args()
+def scan_components(output_dir: Path) -> dict[str, set[str]]:
+    """List existing *.md component names per filtered subdirectory (one scandir each)."""
+    existing = {}
+    for subdir in FILTERED_SUBDIRS:
+        try:
+            with os.scandir(output_dir / subdir) as entries:
+                existing[subdir] = {
+                    entry.name.removesuffix(".md") for entry in entries
+                    if entry.name.endswith(".md") and entry.is_file()
+                }
+        except OSError:
+            existing[subdir] = set()
+    return existing
+
+
+def _file_matches(path: Path, data: bytes) -> bool:
+    """Check whether path already holds data: size from stat first, then a SHA-256."""
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 16), b""):
+                digest.update(block)
+    except OSError:
+        return False
+    return digest.digest() == hashlib.sha256(data).digest()
+
+
+def write_output(out_path: Path, text: str) -> bool:
+    """
+    Write text unless the file already holds it; return True if written.
+
+    Unchanged files keep their mtime, so editors, rsync and mtime-keyed
+    caches do not see a spurious change.
+    """
+    data = text.encode("utf-8")
+    changed = not _file_matches(out_path, data)
+
+    if changed:
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_bytes(data)
+
+    # Make hooks executable (only touch the mode when it is wrong)
+    if "hooks" in str(out_path) and out_path.suffix == ".sh":
+        mode = out_path.stat().st_mode
+        if mode | stat.S_IEXEC | stat.S_IXGRP != mode:
+            out_path.chmod(mode | stat.S_IEXEC | stat.S_IXGRP)
+    return changed
+
+
+def commit_tree(project_dir: Path, tree: dict[str, str], removals: list[Path],
+                jobs: int = 1) -> dict[str, int]:
+    """
+    Apply the in-memory tree to disk in one pass.
+
+    Removes stale files and writes only outputs whose content changed.
+    Returns counts of written, unchanged and removed files.
+    """
+    removed = 0
+    for path in removals:
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+
+    written = sum(_map(lambda item: write_output(project_dir / item[0], item[1]),
+                       list(tree.items()), jobs))
+    return {"written": written, "unchanged": len(tree) - written, "removed": removed}
+
+
+def affected_outputs(template_dir: Path, archetypes: list[str], paths: list[str],
+                     cache: RenderCache) -> dict[str, dict[str, list[str]]]:
+    """
+    Find the outputs that depend on any of the changed paths.
+
+    Builds the include/extends/import graph of every archetype's outputs
+    (per-template analysis is cached by source hash in the render cache).
+    Changes to manifest.json, the overlays index or this script, and deleted
+    files inside a layer, conservatively affect every output of the
+    archetype; so do changes under a layer for outputs with dynamic includes.
+
+    Returns {archetype: {output path: [changed files it depends on]}}.
+    """
+    changed = {Path(path).resolve() for path in paths}
+    global_inputs = {(template_dir / "overlays" / "manifest.json").resolve(),
+                     Path(__file__).resolve()}
+
+    result = {}
+    for archetype in archetypes:
+        overlay_dir = template_dir / "overlays" / archetype
+        layers = profile_layers(template_dir, archetype)
+        layer_roots = [layer_dir.resolve() for _, layer_dir in layers]
+        manifest = load_manifest(overlay_dir) if overlay_dir.exists() else {}
+        agents, skills, commands = merge_components(manifest)
+        env = create_environment(layers)
+        outputs = resolve_outputs(layers, SUBDIRS,
+                                  {"agents": agents, "skills": skills, "commands": commands})
+
+        in_layers = {path for path in changed
+                     if any(path.is_relative_to(root) for root in layer_roots)}
+        everything = {path for path in changed
+                      if path in global_inputs
+                      or path == (overlay_dir / "manifest.json").resolve()
+                      or (path in in_layers and not path.exists())}
+
+        affected = {}
+        for out_rel, (name, _) in outputs.items():
+            files = cache.source_files(env, name)
+            hits = everything | (in_layers if files is None else changed & files)
+            if hits:
+                affected[out_rel] = sorted(str(path) for path in hits)
+        if affected:
+            result[archetype] = affected
+    return result
 
-    template_dir = Path(args.template_dir)
-    project_dir = Path(args.project_dir)
-    base_dir = template_dir / "base"
-    overlay_dir = template_dir / "overlays" / args.archetype
-    shared_dir = template_dir / "shared"
-    output_dir = project_dir / ".claude"
 
-    # Validate
-    if not base_dir.exists():
-        print(f"ERROR: Base template not found: {base_dir}", file=sys.stderr)
-        sys.exit(1)
+def load_archetype(template_dir: Path, archetype: str, bundle_dir: Path | None,
+                   cache: RenderCache | None) -> dict:
+    """
+    Load everything a profile needs that does not depend on the project.
 
+    Returns the overlay manifest, merged agents/skills/commands, the
+    Environment (compiled bundle or templates) and the resolved output map.
+    Fleet and matrix runs load this once per archetype and share it.
+    """
+    overlay_dir = template_dir / "overlays" / archetype
     if not overlay_dir.exists():
-        print(f"WARNING: No overlay for archetype '{args.archetype}', using base only",
+        print(f"WARNING: No overlay for archetype '{archetype}', using base only",
               file=sys.stderr)
 
+    layers = profile_layers(template_dir, archetype)
+    bundle = None
+    if overlay_dir.exists() and bundle_dir is not None:
+        bundle = load_bundle(bundle_dir, archetype, layers)
+
     # Load manifest
-    manifest = load_manifest(overlay_dir) if overlay_dir.exists() else {}
+    if bundle:
+        manifest = bundle[1]["manifest"]
+    else:
+        manifest = load_manifest(overlay_dir) if overlay_dir.exists() else {}
 
     # Merge components
-    base_agents = ["coordinator", "code-assistant", "reviewer", "tester"]
-    base_skills = ["validate"]
-    base_commands = ["health"]
+    agents, skills, commands = merge_components(manifest)
+
+    # Resolve base -> shared -> overlay into one output map, then render each output once
+    if bundle:
+        env, outputs = bundle[0], bundle[1]["outputs"]
+        if cache is not None:
+            cache.register(env, bundle[1]["dependencies"])
+    else:
+        env = create_environment(layers)
+        outputs = resolve_outputs(layers, SUBDIRS,
+                                  {"agents": agents, "skills": skills, "commands": commands})
+
+    return {"manifest": manifest, "agents": agents, "skills": skills, "commands": commands,
+            "env": env, "outputs": outputs}
+
+
+# --- Token accounting ---
+
+# Same estimate and thresholds as validate-token-budget.sh: characters / 4,
+# warn at 90% of a budget
+TOKEN_REPORT = ".claude/token-budget.json"
+TOKEN_WARN_THRESHOLD = 90
+DEFAULT_TOKEN_BUDGETS = {
+    "claude_md": 1500,  # P0 chain guideline: CLAUDE.md is loaded every session
+    "agent": 800,       # P1 file guideline: loaded on demand
+    "skill": 800,
+    "command": 800,
+}
+COMPONENT_KINDS = {"agents": "agent", "skills": "skill", "commands": "command"}
+
+
+def parse_token_budget(value: str) -> tuple[str, int]:
+    """argparse type for --token-budget KIND=TOKENS."""
+    kind, _, tokens = value.partition("=")
+    if kind not in DEFAULT_TOKEN_BUDGETS or not tokens.isdigit() or int(tokens) == 0:
+        raise argparse.ArgumentTypeError(
+            f"expected KIND=TOKENS with KIND in {', '.join(DEFAULT_TOKEN_BUDGETS)}")
+    return kind, int(tokens)
+
+
+def validate_token_budgets(budgets, source: Path):
+    """Reject token_budgets with unknown kinds or values that are not positive integers."""
+    if not isinstance(budgets, dict):
+        raise ValueError(f"{source}: token_budgets must be an object of KIND: TOKENS")
+    for kind, tokens in budgets.items():
+        if kind not in DEFAULT_TOKEN_BUDGETS:
+            raise ValueError(f"{source}: unknown token budget '{kind}' "
+                             f"(expected {', '.join(DEFAULT_TOKEN_BUDGETS)})")
+        if isinstance(tokens, bool) or not isinstance(tokens, int) or tokens <= 0:
+            raise ValueError(f"{source}: token budget '{kind}' must be a positive integer, "
+                             f"got {tokens!r}")
+
+
+def token_budgets(manifest: dict, overrides: list[tuple[str, int]] | None) -> dict[str, int]:
+    """Default budgets, then the overlay manifest's token_budgets, then --token-budget."""
+    budgets = dict(DEFAULT_TOKEN_BUDGETS)
+    budgets.update(manifest.get("token_budgets", {}))
+    budgets.update(overrides or [])
+    return budgets
+
+
+def account_tokens(tree: dict[str, str], project_dir: Path, outputs: list[str],
+                   budgets: dict[str, int]) -> dict:
+    """
+    Build the token budget report for a profile's markdown outputs.
+
+    Counts come from the rendered text in tree. Outputs not rendered in this
+    run (--affected-by) reuse the previous report, falling back to the file
+    on disk. Agents, skills and commands are aggregated per component and
+    checked against their budgets together with CLAUDE.md.
+    """
+    try:
+        previous = json.loads((project_dir / TOKEN_REPORT).read_text(encoding="utf-8"))["files"]
+    except (OSError, ValueError, KeyError):
+        previous = {}
+
+    files = {}
+    for out_rel in sorted(set(outputs) | set(tree)):
+        if not out_rel.endswith(".md"):
+            continue
+        if out_rel in tree:
+            chars = len(tree[out_rel])
+        elif out_rel in previous:
+            chars = previous[out_rel]["chars"]
+        elif (project_dir / out_rel).is_file():
+            chars = len((project_dir / out_rel).read_text(encoding="utf-8"))
+        else:
+            continue
+        files[out_rel] = {"chars": chars, "tokens": chars // 4}
+
+    chars_by_component = {subdir: {} for subdir in COMPONENT_KINDS}
+    for out_rel, entry in files.items():
+        parts = out_rel.split("/")
+        if len(parts) > 2 and parts[0] == ".claude" and parts[1] in COMPONENT_KINDS:
+            components = chars_by_component[parts[1]]
+            name = parts[2].removesuffix(".md")
+            components[name] = components.get(name, 0) + entry["chars"]
+    components = {subdir: {name: chars // 4 for name, chars in sorted(chars_by_component[subdir].items())}
+                  for subdir in COMPONENT_KINDS}
+
+    checks = []
+    if "CLAUDE.md" in files:
+        checks.append(("claude_md", "CLAUDE.md", files["CLAUDE.md"]["tokens"]))
+    for subdir, kind in COMPONENT_KINDS.items():
+        checks.extend((kind, name, tokens) for name, tokens in components[subdir].items())
+
+    violations = []
+    for kind, name, tokens in checks:
+        budget = budgets[kind]
+        if tokens > budget:
+            status = "over"
+        elif tokens * 100 // budget >= TOKEN_WARN_THRESHOLD:
+            status = "warn"
+        else:
+            continue
+        violations.append({"kind": kind, "name": name, "tokens": tokens,
+                           "budget": budget, "status": status})
+
+    return {
+        "estimate": "characters / 4",
+        "budgets": budgets,
+        "total_tokens": sum(entry["chars"] for entry in files.values()) // 4,
+        "files": files,
+        "components": components,
+        "violations": violations,
+    }
 
-    agents = merge_agents(base_agents, manifest)
-    skills = merge_lists(base_skills, manifest, "skills")
-    commands = merge_lists(base_commands, manifest, "commands")
 
-    # Determine removed agents for cleanup
-    removed_agents = set(manifest.get("agents", {}).get("remove", []))
+def print_budget_violations(report: dict, project_name: str):
+    """Print token budget warnings for one profile to stderr."""
+    for violation in report["violations"]:
+        label = "CLAUDE.md" if violation["kind"] == "claude_md" else \
+            f"{violation['kind']} '{violation['name']}'"
+        tokens, budget = violation["tokens"], violation["budget"]
+        if violation["status"] == "over":
+            detail = f"+{tokens - budget} over"
+        else:
+            detail = f"{tokens * 100 // budget}% used"
+        print(f"WARNING: {project_name}: {label} is ~{tokens} tokens "
+              f"(budget: {budget}, {detail})", file=sys.stderr)
+
+
+def generate_profile(args, template_dir: Path, project_dir: Path, bundle_dir: Path | None,
+                     cache: RenderCache | None, jobs: int = 1,
+                     only: set[str] | None = None, context: dict | None = None) -> dict[str, int]:
+    """
+    Generate one project's .claude/ profile.
+
+    args supplies archetype, project_name, language and project_description
+    (see build_template_vars). With only, just those output paths are
+    rendered (AGENTS.md is always rebuilt). context is a preloaded
+    load_archetype() result. Returns component counts, "files"
+    (outputs in the tree) and the written/unchanged/removed counts from
+    commit_tree.
+    """
+    output_dir = project_dir / ".claude"
+    if context is None:
+        context = load_archetype(template_dir, args.archetype, bundle_dir, cache)
+    manifest, env, outputs = context["manifest"], context["env"], context["outputs"]
+    agents, skills, commands = context["agents"], context["skills"], context["commands"]
 
     # Build template variables
     template_vars = build_template_vars(args, manifest, agents, skills, commands)
@@ -280,39 +983,416 @@ def main():
     # Create output directory
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Render base templates
-    subdirs = ["agents", "skills", "commands", "hooks"]
-    render_root_templates(base_dir, output_dir, template_vars)
-    render_templates(base_dir, output_dir, template_vars, subdirs)
+    if only is not None:
+        outputs = {out_rel: source for out_rel, source in outputs.items() if out_rel in only}
+    tree = render_tree(env, outputs, template_vars, jobs=jobs, cache=cache)
 
-    # Render shared templates (fallback for agents/skills/commands not in overlay)
-    if shared_dir.exists():
-        copy_overlay_templates(shared_dir, output_dir, template_vars, subdirs)
+    # Components on disk that are not in the merged lists (earlier runs, removed agents)
+    allowed = {"agents": set(agents), "skills": set(skills), "commands": set(commands)}
+    existing = scan_components(output_dir)
+    stale = {subdir: existing[subdir] - allowed[subdir] for subdir in FILTERED_SUBDIRS}
+    removals = [output_dir / subdir / f"{name}.md"
+                for subdir in FILTERED_SUBDIRS for name in sorted(stale[subdir])]
 
-    # Render overlay templates (overwrite base/shared where applicable)
-    if overlay_dir.exists():
-        copy_overlay_templates(overlay_dir, output_dir, template_vars, subdirs)
+    # AGENTS.md registry from rendered text (kept files from earlier runs are read once)
+    descriptions = {}
+    for agent in agents:
+        agent_rel = f".claude/agents/{agent}.md"
+        if agent_rel in tree:
+            descriptions[agent] = agent_description(tree[agent_rel])
+        elif agent in existing["agents"]:
+            descriptions[agent] = agent_description((output_dir / "agents" / f"{agent}.md").read_text())
+    tree[".claude/AGENTS.md"] = build_agents_md(agents, args.project_name, descriptions)
+    tree[PROFILE_METADATA] = json.dumps({
+        "archetype": args.archetype,
+        "project_name": args.project_name,
+        "language": args.language,
+        "project_description": args.project_description,
+    }, indent=2) + "\n"
 
-    # Cleanup: remove agents that were excluded by manifest
-    for agent_name in removed_agents:
-        agent_file = output_dir / "agents" / f"{agent_name}.md"
-        if agent_file.exists():
-            agent_file.unlink()
+    # Token accounting over the rendered text, before anything is written
+    report = account_tokens(tree, project_dir, list(context["outputs"]),
+                            token_budgets(manifest, args.token_budget))
+    print_budget_violations(report, args.project_name)
+    tree[TOKEN_REPORT] = json.dumps(report, indent=2) + "\n"
 
-    # Remove shared/overlay files not in final merged lists
-    _cleanup_extra_files(output_dir / "agents", agents, ".md")
-    _cleanup_extra_files(output_dir / "skills", skills, ".md")
-    _cleanup_extra_files(output_dir / "commands", commands, ".md")
+    # Summary
+    counts = commit_tree(project_dir, tree, removals, jobs=jobs)
+    for subdir in FILTERED_SUBDIRS:
+        rendered = {out_rel.split("/")[2].removesuffix(".md") for out_rel in tree
+                    if out_rel.startswith(f".claude/{subdir}/") and out_rel.count("/") == 2
+                    and out_rel.endswith(".md")}
+        counts[subdir] = len((existing[subdir] - stale[subdir]) | rendered)
+    counts["files"] = len(tree)
+    counts["tokens"] = report["total_tokens"]
+    counts["over_budget"] = sum(v["status"] == "over" for v in report["violations"])
+    return counts
+
+
+# --- Fleet mode ---
+
+# Generation parameters, read back by --fleet to regenerate a project
+PROFILE_METADATA = ".claude/profile.json"
+
+
+def read_profile_metadata(project_dir: Path) -> dict | None:
+    """
+    Read how a project's profile was generated.
+
+    Uses .claude/profile.json; profiles generated before it existed fall
+    back to settings.json (projectType/projectName) and the primary language
+    line in CLAUDE.md. Returns None when the directory has no profile.
+    """
+    try:
+        return json.loads((project_dir / PROFILE_METADATA).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+    try:
+        settings = json.loads((project_dir / ".claude" / "settings.json").read_text(encoding="utf-8"))
+        metadata = {"archetype": settings["projectType"], "project_name": settings["projectName"],
+                    "language": None, "project_description": None}
+    except (OSError, ValueError, KeyError):
+        return None
+    try:
+        match = re.search(r"Primary language: (\S+?)\.?$",
+                          (project_dir / "CLAUDE.md").read_text(encoding="utf-8"), re.MULTILINE)
+        if match:
+            metadata["language"] = match.group(1)
+    except OSError:
+        pass
+    return metadata
+
+
+def expand_fleet(patterns: list[str]) -> list[Path]:
+    """Expand project dirs, globs and @file lists (one path or glob per line)."""
+    entries = []
+    for pattern in patterns:
+        if pattern.startswith("@"):
+            lines = Path(pattern[1:]).read_text(encoding="utf-8").splitlines()
+            entries.extend(line.strip() for line in lines
+                           if line.strip() and not line.lstrip().startswith("#"))
+        else:
+            entries.append(pattern)
 
-    # Generate AGENTS.md registry
-    generate_agents_md(output_dir, agents, args.project_name)
+    projects: dict[Path, None] = {}
+    for entry in entries:
+        matches = sorted(glob.glob(os.path.expanduser(entry), recursive=True)) or [entry]
+        for match in matches:
+            if os.path.isdir(match):
+                projects.setdefault(Path(match).resolve(), None)
+    return list(projects)
 
-    # Summary
-    agent_count = len(list((output_dir / "agents").glob("*.md"))) if (output_dir / "agents").exists() else 0
-    skill_count = len(list((output_dir / "skills").glob("*.md"))) if (output_dir / "skills").exists() else 0
-    cmd_count = len(list((output_dir / "commands").glob("*.md"))) if (output_dir / "commands").exists() else 0
 
-    print(f"Generated .claude/ profile: {agent_count} agents, {skill_count} skills, {cmd_count} commands")
+class FleetCheckpoint:
+    """
+    Append-only JSONL record of finished projects for resumable fleet runs.
+
+    The first line holds a fingerprint of the template tree; a checkpoint
+    written for other templates is discarded rather than resumed.
+    """
+
+    def __init__(self, path: Path, fingerprint: str):
+        self.path = path
+        self.done: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        resumable = False
+        try:
+            with open(path, encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("fingerprint") == fingerprint:
+                    resumable = True
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # partially written last line
+                        self.done[record["project"]] = record
+        except (OSError, ValueError):
+            pass
+
+        if not resumable:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"fingerprint": fingerprint}) + "\n")
+
+    def record(self, project_dir: Path, **fields):
+        """Mark a project as done (flushed immediately)."""
+        record = {"project": str(project_dir), **fields}
+        with self._lock:
+            self.done[record["project"]] = record
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+def generate_fleet(args, template_dir: Path, patterns: list[str], bundle_dir: Path | None,
+                   cache: RenderCache) -> int:
+    """
+    Regenerate the profiles of many existing projects.
+
+    Each project's archetype and parameters come from read_profile_metadata.
+    Manifests, compiled templates and the render cache are loaded once per
+    archetype and shared by a --jobs thread pool. Returns the exit code.
+    """
+    projects = expand_fleet(patterns)
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = FleetCheckpoint(Path(args.checkpoint),
+                                     source_hash([("templates", template_dir)]))
+
+    jobs_list, skipped = [], 0
+    for project_dir in projects:
+        if checkpoint and str(project_dir) in checkpoint.done:
+            skipped += 1
+            continue
+        jobs_list.append((project_dir, read_profile_metadata(project_dir)))
+
+    contexts = {}
+    for _, metadata in jobs_list:
+        if metadata and metadata["archetype"] not in contexts:
+            contexts[metadata["archetype"]] = load_archetype(
+                template_dir, metadata["archetype"], bundle_dir, cache)
+
+    print(f"Fleet: {len(projects)} project(s), {len(jobs_list)} to generate, "
+          f"{skipped} already done (checkpoint), {len(contexts)} archetype(s)")
+
+    def run(job):
+        project_dir, metadata = job
+        if metadata is None:
+            return None, None, 0.0
+        start = time.perf_counter()
+        profile_args = argparse.Namespace(**{**vars(args), **metadata})
+        try:
+            counts = generate_profile(profile_args, template_dir, project_dir, bundle_dir,
+                                      cache, context=contexts[metadata["archetype"]])
+        except Exception as e:
+            return None, str(e), time.perf_counter() - start
+        return counts, None, time.perf_counter() - start
+
+    start = time.perf_counter()
+    failed = missing = over_budget = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(run, job): job for job in jobs_list}
+        for index, future in enumerate(as_completed(futures), start=1):
+            project_dir, metadata = futures[future]
+            counts, error, elapsed = future.result()
+            prefix = f"[{index}/{len(jobs_list)}] {project_dir}"
+            if metadata is None:
+                missing += 1
+                print(f"{prefix}: SKIPPED: no profile metadata")
+                continue
+            if error:
+                failed += 1
+                print(f"{prefix}: FAILED: {error}")
+                continue
+            if counts["over_budget"]:
+                over_budget += 1
+            print(f"{prefix} ({metadata['archetype']}): {counts['written']} written, "
+                  f"{counts['unchanged']} unchanged, {counts['removed']} removed, "
+                  f"~{counts['tokens']} tokens in {elapsed * 1000:.1f}ms")
+            if checkpoint:
+                checkpoint.record(project_dir, archetype=metadata["archetype"],
+                                  elapsed=round(elapsed, 4), written=counts["written"])
+
+    wall_time = time.perf_counter() - start
+    print(f"Fleet done: {len(jobs_list) - failed - missing} ok, {failed} failed, "
+          f"{missing} without profile, {over_budget} over token budget in {wall_time:.2f}s; "
+          f"renders: {cache.misses} rendered, {cache.hits} reused")
+    return 1 if failed or (args.strict_budgets and over_budget) else 0
+
+
+# Shared by all archetypes in a matrix run so that name-dependent base renders are reused
+MATRIX_PROJECT_NAME = "example-project"
+
+
+def generate_matrix(args, template_dir: Path, out_dir: Path, bundle_dir: Path | None,
+                    cache: RenderCache, archetypes: list[str] | None = None,
+                    only: dict[str, set[str]] | None = None) -> int:
+    """
+    Generate every archetype's profile into <out_dir>/<archetype>/.
+
+    The overlays index is read once, archetypes are rendered in parallel
+    (--jobs threads) and share one render cache, so base templates whose
+    variables are identical across archetypes are rendered only once.
+    archetypes/only restrict the run (see --affected-by). Returns the exit code.
+    """
+    if archetypes is None:
+        archetypes = load_manifest(template_dir / "overlays").get("archetypes", [])
+    if not archetypes:
+        print(f"ERROR: No archetypes listed in {template_dir / 'overlays' / 'manifest.json'}",
+              file=sys.stderr)
+        return 1
+
+    def run(archetype: str):
+        start = time.perf_counter()
+        profile_args = argparse.Namespace(**{
+            **vars(args),
+            "archetype": archetype,
+            "project_name": args.project_name or MATRIX_PROJECT_NAME,
+        })
+        try:
+            counts = generate_profile(profile_args, template_dir, out_dir / archetype,
+                                      bundle_dir, cache, only=(only or {}).get(archetype))
+            return counts, None, time.perf_counter() - start
+        except Exception as e:
+            return None, str(e), time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = _map(run, archetypes, args.jobs)
+    wall_time = time.perf_counter() - start
+
+    width = max(len(archetype) for archetype in archetypes)
+    print(f"Archetype matrix: {len(archetypes)} archetypes -> {out_dir}")
+    print(f"  {'Archetype':<{width}}  {'Files':>5}  {'Agents':>6}  {'Skills':>6}  "
+          f"{'Commands':>8}  {'Written':>7}  {'Tokens':>6}  {'Time':>9}")
+    failed = over_budget = 0
+    for archetype, (counts, error, elapsed) in zip(archetypes, results):
+        if error:
+            failed += 1
+            print(f"  {archetype:<{width}}  FAILED: {error}")
+            continue
+        over_budget += bool(counts["over_budget"])
+        print(f"  {archetype:<{width}}  {counts['files']:>5}  {counts['agents']:>6}  "
+              f"{counts['skills']:>6}  {counts['commands']:>8}  {counts['written']:>7}  "
+              f"{counts['tokens']:>6}  {elapsed * 1000:7.1f}ms")
+    print(f"  Wall time: {wall_time * 1000:.1f}ms; renders: {cache.misses} rendered, "
+          f"{cache.hits} reused")
+    if over_budget:
+        print(f"  {over_budget} archetype(s) over token budget")
+    return 1 if failed or (args.strict_budgets and over_budget) else 0
+
+
+def run_affected(args, template_dir: Path, bundle_dir: Path | None):
+    """--affected-by: list impacted outputs, or regenerate just those."""
+    if args.project_dir and not args.archetype:
+        # Regenerate with the parameters the project was generated with; CLI values win
+        metadata = read_profile_metadata(Path(args.project_dir))
+        if metadata is None:
+            sys.exit(f"ERROR: {args.project_dir} has no generated profile; pass --archetype")
+        args = argparse.Namespace(**{**vars(args), **{
+            key: value for key, value in metadata.items() if getattr(args, key, None) is None}})
+    cache = RenderCache(None if args.no_render_cache else default_cache_dir() / "profile-renders")
+    bundle_dir = None if args.no_bundle else bundle_dir
+    if args.archetype:
+        archetypes = [args.archetype]
+    else:
+        archetypes = load_manifest(template_dir / "overlays").get("archetypes", [])
+
+    affected = affected_outputs(template_dir, archetypes, args.affected_by, cache)
+    if not affected:
+        print("No outputs affected")
+        return
+    for archetype, outputs in affected.items():
+        print(f"{archetype}: {len(outputs)} output(s)")
+        for out_rel in outputs:
+            print(f"  {out_rel}")
+
+    only = {archetype: set(outputs) for archetype, outputs in affected.items()}
+    if args.out:
+        print()
+        sys.exit(generate_matrix(args, template_dir, Path(args.out), bundle_dir, cache,
+                                 archetypes=list(affected), only=only))
+    if args.project_dir and args.archetype in affected:
+        if args.project_name is None:
+            sys.exit("ERROR: --project-name is required to regenerate a project")
+        counts = generate_profile(args, template_dir, Path(args.project_dir), bundle_dir, cache,
+                                  jobs=args.jobs, only=only[args.archetype])
+        print(f"Regenerated {len(only[args.archetype])} affected output(s): "
+              f"{counts['written']} written, {counts['unchanged']} unchanged, "
+              f"{counts['removed']} removed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate .claude/ profile for a project")
+    parser.add_argument("--archetype", help="Archetype name")
+    parser.add_argument("--project-name", help="Project name")
+    parser.add_argument("--project-dir", help="Project directory path")
+    parser.add_argument("--template-dir", required=True, help="Claude profile templates directory")
+    parser.add_argument("--language", default=None, help="Primary language override")
+    parser.add_argument("--project-description", default=None, help="Project description")
+    parser.add_argument("--build-bundles", action="store_true",
+                        help="Precompile bundles for --archetype (default: all archetypes) and exit")
+    parser.add_argument("--bundle-dir", default=None,
+                        help="Precompiled bundle directory (default: <cache>/profile-bundles)")
+    parser.add_argument("--no-bundle", action="store_true",
+                        help="Always compile templates from source")
+    parser.add_argument("--no-render-cache", action="store_true",
+                        help="Do not read or write the on-disk render cache")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Threads for rendering and writing outputs (default: CPU count)")
+    parser.add_argument("--all-archetypes", action="store_true",
+                        help="Generate every archetype from overlays/manifest.json into --out")
+    parser.add_argument("--out", default=None,
+                        help="Output directory for --all-archetypes (one subdirectory per archetype)")
+    parser.add_argument("--fleet", nargs="+", default=None, metavar="DIR",
+                        help="Regenerate existing projects (dirs, globs or @listfile) from "
+                             "their profile metadata")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Resumable --fleet checkpoint file (JSONL)")
+    parser.add_argument("--token-budget", type=parse_token_budget, action="append",
+                        default=None, metavar="KIND=TOKENS",
+                        help="Override a token budget (claude_md, agent, skill, command)")
+    parser.add_argument("--strict-budgets", action="store_true",
+                        help="Exit 1 when any output is over its token budget")
+    parser.add_argument("--affected-by", nargs="+", default=None, metavar="PATH",
+                        help="List outputs depending on these template files; with --out or "
+                             "--project-dir regenerate only those (--project-dir alone reads "
+                             "the archetype from .claude/profile.json)")
+    args = parser.parse_args()
+
+    template_dir = Path(args.template_dir)
+    bundle_dir = Path(args.bundle_dir) if args.bundle_dir else default_bundle_dir()
+
+    if args.build_bundles:
+        if args.archetype:
+            archetypes = [args.archetype]
+        else:
+            archetypes = load_manifest(template_dir / "overlays").get("archetypes", [])
+        sys.exit(1 if build_bundles(template_dir, bundle_dir, archetypes) else 0)
+
+    if args.affected_by:
+        try:
+            return run_affected(args, template_dir, bundle_dir)
+        except ValueError as e:
+            sys.exit(f"ERROR: {e}")
+
+    if args.fleet:
+        required = ()
+    elif args.all_archetypes:
+        required = ("out",)
+    else:
+        required = ("archetype", "project_name", "project_dir")
+    for option in required:
+        if getattr(args, option) is None:
+            parser.error(f"--{option.replace('_', '-')} is required")
+
+    base_dir = template_dir / "base"
+    if not base_dir.exists():
+        print(f"ERROR: Base template not found: {base_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    cache = RenderCache(None if args.no_render_cache else default_cache_dir() / "profile-renders")
+    bundle_dir = None if args.no_bundle else bundle_dir
+
+    if args.fleet:
+        sys.exit(generate_fleet(args, template_dir, args.fleet, bundle_dir, cache))
+
+    if args.all_archetypes:
+        sys.exit(generate_matrix(args, template_dir, Path(args.out), bundle_dir, cache))
+
+    try:
+        counts = generate_profile(args, template_dir, Path(args.project_dir), bundle_dir,
+                                  cache, jobs=args.jobs)
+    except ValueError as e:
+        sys.exit(f"ERROR: {e}")
+    print(f"Generated .claude/ profile: {counts['agents']} agents, {counts['skills']} skills, "
+          f"{counts['commands']} commands ({counts['written']} written, "
+          f"{counts['unchanged']} unchanged, {counts['removed']} removed), "
+          f"~{counts['tokens']} tokens")
+    if args.strict_budgets and counts["over_budget"]:
+        print(f"ERROR: {counts['over_budget']} output(s) over token budget "
+              f"(see {TOKEN_REPORT})", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
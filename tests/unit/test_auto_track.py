@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Unit tests for auto-track.py
+
+Tests the DocumentationTracker for:
+- Range tracking in one pass with a single write per document
+- Git object reads through one persistent cat-file process, ranges through git
+- TASKS.md document model and progress recalculation
+- Indexed CHANGELOG.md head splicing
+"""
+
+import importlib.util
+import json
+import shutil
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[2] / "scripts"
+
+
+def _load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, SCRIPTS_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+auto_track = _load_module("auto_track", "auto-track.py")
+
+TASKS = """# Tasks
+
+**Общий Прогресс:** 0%
+
+### TASK-001: Parser ⏳
+- parse input
+
+### TASK-002: Writer ⏳
+- write output
+"""
+
+
+def git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def commit(repo, message, *files):
+    for name in files:
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"{message}\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", message)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """Git repo with TASKS.md and a few tracked commits after the base commit."""
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "dev@example.com")
+    git(repo, "config", "user.name", "Dev")
+    (repo / "TASKS.md").write_text(TASKS)
+    commit(repo, "initial", "README.md")
+    commit(repo, "TASK-001: start parser", "src/parser.py")
+    commit(repo, "drop legacy writer module", "src/writer.py", "src/io.py", "docs/writer.md")
+    commit(repo, "TASK-001: parser done", "src/parser.py", ".tracking/notes")
+    commit(repo, "fix: writer off-by-one TASK-002", "src/writer.py")
+    return repo
+
+
+class TestTrackRange:
+    """Test suite for track-range."""
+
+    def test_iter_commits_streams_oldest_first(self, repo):
+        """Test that commits come oldest first with their changed files."""
+        tracker = auto_track.DocumentationTracker(repo)
+
+        commits = list(tracker.iter_commits("HEAD~4..HEAD"))
+
+        assert [c["message"] for c in commits] == [
+            "TASK-001: start parser", "drop legacy writer module",
+            "TASK-001: parser done", "fix: writer off-by-one TASK-002",
+        ]
+        assert commits[1]["files_changed"] == ["docs/writer.md", "src/io.py", "src/writer.py"]
+        assert commits[2]["files_changed"] == ["src/parser.py"]
+        assert commits[3]["hash"] == git(repo, "rev-parse", "HEAD").strip()
+
+    def test_range_matches_per_commit_tracking(self, repo, tmp_path):
+        """Test that one range pass leaves the same documents as track-commit per commit."""
+        single = tmp_path / "single"
+        shutil.copytree(repo, single)
+        tracker = auto_track.DocumentationTracker(single)
+        for sha in git(single, "rev-list", "--reverse", "HEAD~4..HEAD").split():
+            tracker.track_commit(sha)
+
+        result = auto_track.DocumentationTracker(repo).track_range("HEAD~4..HEAD")
+
+        assert result == {"commits": 4, "tasks_updated": 3, "changelog_entries": 2}
+        for name in ("TASKS.md", "CHANGELOG.md"):
+            assert (repo / name).read_text() == (single / name).read_text()
+
+    def test_bad_range_writes_nothing(self, repo):
+        """Test that a failing git log raises before any document is written."""
+        tracker = auto_track.DocumentationTracker(repo)
+
+        with pytest.raises(RuntimeError):
+            tracker.track_range("no-such-rev..HEAD")
+
+        assert (repo / "TASKS.md").read_text() == TASKS
+        assert not (repo / "CHANGELOG.md").exists()
+
+
+class TestGitReader:
+    """Test suite for the cat-file based git access layer."""
+
+    def test_commit_info_matches_git_show(self, repo, monkeypatch):
+        """Test that parsed commits match git show, with one cat-file process for all reads."""
+        shas = git(repo, "rev-list", "HEAD").split()
+        spawned = []
+        popen = subprocess.Popen
+        monkeypatch.setattr(auto_track.subprocess, "Popen",
+                            lambda args, **kwargs: spawned.append(args) or popen(args, **kwargs))
+        tracker = auto_track.DocumentationTracker(repo)
+
+        infos = [tracker.get_commit_info(sha) for sha in shas]
+        log = tracker.get_commits_since_last_session()
+        tracker.close()
+        monkeypatch.undo()
+
+        assert spawned == [["git", "cat-file", "--batch"],
+                           ["git", "rev-list", "--max-count=10", "HEAD", "--"]]
+        for sha, info in zip(shas, infos):
+            subject, author, date = git(repo, "show", "-s", "--format=%s%n%an%n%ad",
+                                        "--date=iso", sha).splitlines()
+            files = git(repo, "show", "--name-only", "--format=", sha).split()
+            assert info == {"hash": sha, "message": subject, "author": author, "date": date,
+                            "files_changed": [f for f in files if not f.startswith(".tracking/")]}
+        assert [c["hash"] for c in log] == shas
+
+    def test_changed_files_count_compares_trees(self, repo):
+        """Test that the session file count diffs HEAD~10 and HEAD trees."""
+        for index in range(6):
+            commit(repo, f"step {index}", f"steps/{index}.txt")
+        tracker = auto_track.DocumentationTracker(repo)
+
+        count = tracker.get_changed_files_count()
+
+        expected = git(repo, "diff", "--name-only", "HEAD~10", "HEAD").split()
+        assert count == len(expected)
+        assert auto_track.DocumentationTracker(repo).git.commit("HEAD~99") is None
+
+    def test_unchanged_rename_lists_new_path_only(self, repo):
+        """Test that a pure move is reported like git show --name-only."""
+        git(repo, "mv", "src/io.py", "src/stream.py")
+        git(repo, "commit", "-q", "-m", "move io")
+        tracker = auto_track.DocumentationTracker(repo)
+
+        files = tracker.get_commit_info("HEAD")["files_changed"]
+
+        assert files == git(repo, "show", "--name-only", "--format=", "HEAD").split()
+        assert files == ["src/stream.py"]
+
+    def test_edited_rename_and_long_subject_match_git_show(self, repo):
+        """Test that a rename with edits is listed once and %s joins the first paragraph."""
+        (repo / "src" / "parser.py").write_text("".join(f"rule {i}\n" for i in range(20)))
+        commit(repo, "grow parser")
+        git(repo, "mv", "src/parser.py", "src/grammar.py")
+        with (repo / "src" / "grammar.py").open("a") as f:
+            f.write("rule 20\n")
+        git(repo, "commit", "-q", "-am", "move parser\ninto grammar\n\nbody text")
+        tracker = auto_track.DocumentationTracker(repo)
+
+        info = tracker.get_commit_info("HEAD")
+
+        assert info["files_changed"] == ["src/grammar.py"]
+        assert info["files_changed"] == git(repo, "show", "--name-only", "--format=", "HEAD").split()
+        assert info["message"] == "move parser into grammar"
+        assert info["message"] == git(repo, "show", "-s", "--format=%s", "HEAD").strip()
+
+    def test_limited_log_stops_walking(self, repo, monkeypatch):
+        """Test that a limited log reads only the commits it returns."""
+        for index in range(20):
+            git(repo, "commit", "-q", "--allow-empty", "-m", f"empty {index}")
+        reader = auto_track.GitReader(repo)
+        reads = []
+        read = reader.read
+        monkeypatch.setattr(reader, "read", lambda rev: reads.append(rev) or read(rev))
+
+        commits = reader.log("HEAD", limit=3)
+        reader.close()
+
+        assert [c["hash"] for c in commits] == git(repo, "rev-list", "-3", "HEAD").split()
+        assert len(reads) <= 5
+
+    def test_range_with_skewed_dates_matches_git(self, repo, monkeypatch):
+        """Test that an ancestor dated after the excluded tip is not part of the range."""
+        git(repo, "checkout", "-q", "-b", "side", "HEAD~2")
+        monkeypatch.setenv("GIT_COMMITTER_DATE", "2001-01-01T00:00:00")
+        commit(repo, "old-dated side", "side.txt")
+        monkeypatch.delenv("GIT_COMMITTER_DATE")
+        git(repo, "checkout", "-q", "-")
+        tracker = auto_track.DocumentationTracker(repo)
+
+        commits = list(tracker.iter_commits("side..HEAD"))
+
+        expected = git(repo, "log", "--reverse", "--format=%H", "side..HEAD").split()
+        assert [c["hash"] for c in commits] == expected
+        assert [c["hash"] for c in tracker.git.log("side..HEAD")] == expected[::-1]
+
+
+PHASED_TASKS = """# Tasks
+
+**Общий Прогресс:** 0%
+
+## 🎯 Фаза 1: Core | 🔄 В работе | 0%
+
+### TASK-001: Parser ✅ ВЫПОЛНЕНО
+### TASK-002: Writer ✅ ВЫПОЛНЕНО
+
+## 🎯 Фаза \\#: Docs | 🔄 В работе | 0%
+
+### TASK-003: Guide ⏳
+#### NOTE-1: not a task
+"""
+
+
+class TestTasksDocument:
+    """Test suite for the TASKS.md model."""
+
+    def test_single_pass_counts(self):
+        """Test that tasks, completions and phases are counted in one scan."""
+        document = auto_track.TasksDocument(PHASED_TASKS)
+
+        assert (document.total_tasks, document.completed, document.progress) == (3, 2, 66)
+        assert [(p["name"], p["tasks"], p["completed"]) for p in document.phases] == [
+            ("Core", 2, 2), ("Docs", 2, 0)]
+
+    def test_recalculate_keeps_phase_numbers(self):
+        """Test that phase headers keep (or regain) their number and reruns are stable."""
+        tracker = auto_track.DocumentationTracker.__new__(auto_track.DocumentationTracker)
+
+        content = tracker.recalculate_progress(PHASED_TASKS)
+
+        assert "**Общий Прогресс:** 66%" in content
+        assert "## 🎯 Фаза 1: Core | ✅ Завершена | 100%" in content
+        assert "## 🎯 Фаза 2: Docs | 🔄 В работе | 0%" in content
+        assert tracker.recalculate_progress(content) is content
+
+
+class TestChangelogSplice:
+    """Test suite for indexed CHANGELOG.md insertion."""
+
+    HEAD = "# 📝 Changelog\n\n## [Unreleased]\n\n### Added\n- old (1234567)\n\n"
+    # Not valid UTF-8: the tail must be copied, never decoded
+    TAIL = b"## [1.0.0] - 2025-01-01\n\n- release \xff\xfe\n"
+
+    @pytest.fixture
+    def tracker(self, tmp_path):
+        tracker = auto_track.DocumentationTracker(tmp_path)
+        tracker.changelog_path.write_bytes(self.HEAD.encode() + self.TAIL)
+        return tracker
+
+    def test_batch_splices_head_and_keeps_tail(self, tracker):
+        """Test that a batch lands in [Unreleased] and the tail bytes are preserved."""
+        commits = [{"hash": "a" * 40, "message": "add parser", "files_changed": []},
+                   {"hash": "b" * 40, "message": "fix \\d escape", "files_changed": []}]
+
+        assert tracker.add_changelog_entries(commits) == 2
+
+        data = tracker.changelog_path.read_bytes()
+        head = data[:-len(self.TAIL)].decode()
+        assert data.endswith(self.TAIL)
+        assert head == ("# 📝 Changelog\n\n## [Unreleased]\n\n### Fixed\n- fix \\d escape (bbbbbbb)\n\n\n"
+                        "### Added\n- add parser (aaaaaaa)\n- old (1234567)\n\n")
+        index = json.loads(tracker.changelog_index.read_text())
+        assert index["head_end"] == len(head.encode())
+
+    def test_external_edit_invalidates_index(self, tracker):
+        """Test that a changed file is rescanned instead of trusting old offsets."""
+        tracker.add_changelog_entry({"hash": "a" * 40, "message": "add parser", "files_changed": []})
+        tracker.changelog_path.write_bytes(b"# \xd0\x9b\n\n" + tracker.changelog_path.read_bytes())
+
+        tracker.add_changelog_entry({"hash": "c" * 40, "message": "remove cli", "files_changed": []})
+
+        text = tracker.changelog_path.read_bytes()
+        assert text.startswith("# Л\n\n# 📝 Changelog".encode())
+        assert b"### Removed\n- remove cli (ccccccc)\n" in text
+        assert text.endswith(self.TAIL)
+
+    def test_legacy_sections_and_subheadings_are_ignored(self, tmp_path):
+        """Test that a new top [Unreleased] is created instead of using '#### Added' elsewhere."""
+        tracker = auto_track.DocumentationTracker(tmp_path)
+        legacy = ("# Changelog\n\n## [1.1.0]\n\n#### Added\n- a\n\n"
+                  "## [Unreleased] - Legacy\n\n#### Added\n- b\n")
+        tracker.changelog_path.write_text(legacy)
+
+        tracker.add_changelog_entry({"hash": "a" * 40, "message": "add parser", "files_changed": []})
+
+        assert tracker.changelog_path.read_text() == (
+            "# Changelog\n\n## [Unreleased]\n\n### Added\n- add parser (aaaaaaa)\n\n\n" + legacy[13:])
+
+    def test_crlf_line_endings_are_preserved(self, tmp_path):
+        """Test that CRLF changelogs get entries with CRLF line endings."""
+        tracker = auto_track.DocumentationTracker(tmp_path)
+        tracker.changelog_path.write_bytes((self.HEAD.encode() + self.TAIL).replace(b"\n", b"\r\n"))
+
+        assert tracker.add_changelog_entry({"hash": "a" * 40, "message": "add parser",
+                                            "files_changed": []}) is None
+
+        data = tracker.changelog_path.read_bytes()
+        assert b"### Added\r\n- add parser (aaaaaaa)\r\n- old (1234567)\r\n" in data
+        assert b"\n" not in data.replace(b"\r\n", b"")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
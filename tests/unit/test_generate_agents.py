@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""
+Unit tests for generate-agents.py
+
+Tests the AgentGenerator pipeline for:
+- Batch manifests (YAML/JSONL)
+- Batch generation in a process pool
+- Compiled template cache
+- Incremental generation via generated.lock
+- Single-pass multi-format output
+- Shared, read-only defaults tables
+- Warm daemon and its thin client
+- Streaming, atomic output writes
+- Render profiling (--stats)
+- Content-addressed dedup store
+- Cached agents.yaml parsing
+- Monorepo package discovery
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import threading
+import pytest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[2] / "scripts"
+# Scripts import their shared helpers (codefoundry_paths) as when run from scripts/
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+def _load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, SCRIPTS_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    # Register so that process-pool workers can unpickle module functions
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+generate_agents = _load_module("generate_agents", "generate-agents.py")
+agents_client = _load_module("generate_agents_client", "generate-agents-client.py")
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep all on-disk caches inside the test's tmp_path."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("CODEFOUNDRY_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture
+def make_request(tmp_path):
+    """Factory for generation requests writing into tmp_path."""
+    def _make(name="Demo", project_type="web-service", language="python", framework="fastapi"):
+        request = generate_agents.AgentGenerationRequest(
+            project_name=name,
+            project_type=project_type,
+            primary_language=language,
+            framework=framework,
+            output_dir=tmp_path / name,
+        )
+        generate_agents.resolve_agents(request, verbose=False)
+        return request
+    return _make
+
+
+class TestBatchManifest:
+    """Test suite for batch manifest loading."""
+
+    def test_load_yaml_manifest(self, tmp_path):
+        """Test YAML manifest with relative output dirs."""
+        manifest = tmp_path / "projects.yaml"
+        manifest.write_text(
+            "projects:\n"
+            "  - project_name: Bot\n"
+            "    project_type: telegram-bot\n"
+            "    framework: aiogram\n"
+            "  - project_name: Api\n"
+            "    project_type: web-service\n"
+            "    language: typescript\n"
+            "    output_dir: services/api\n"
+        )
+
+        requests = generate_agents.load_batch_manifest(manifest)
+
+        assert [r.project_name for r in requests] == ["Bot", "Api"]
+        assert requests[0].output_dir == tmp_path / "Bot"
+        assert requests[1].output_dir == tmp_path / "services" / "api"
+        assert requests[1].primary_language == "typescript"
+
+    def test_load_jsonl_manifest(self, tmp_path):
+        """Test JSONL manifest, one project per line."""
+        manifest = tmp_path / "projects.jsonl"
+        manifest.write_text(
+            json.dumps({"project_name": "Cli", "project_type": "cli-tool"}) + "\n\n"
+        )
+
+        requests = generate_agents.load_batch_manifest(manifest)
+
+        assert len(requests) == 1
+        assert requests[0].project_type == "cli-tool"
+
+    def test_missing_required_field(self, tmp_path):
+        """Test that entries without project_type are rejected."""
+        manifest = tmp_path / "projects.jsonl"
+        manifest.write_text(json.dumps({"project_name": "Broken"}) + "\n")
+
+        with pytest.raises(ValueError, match="project_type"):
+            generate_agents.load_batch_manifest(manifest)
+
+
+class TestBatchGeneration:
+    """Test suite for process-pool batch generation."""
+
+    def test_generate_batch_matches_single_run(self, tmp_path, make_request):
+        """Test that batch output is identical to a sequential run."""
+        single = make_request("Single")
+        generate_agents.AgentGenerator(verbose=False).generate(single)
+
+        batch = make_request("Batch")
+        batch.project_name = "Single"
+        results = generate_agents.generate_batch([batch], jobs=1)
+
+        assert results[0].error is None
+        assert results[0].agents_count == len(single.agents)
+        for path in (single.output_dir / ".claude").iterdir():
+            assert (batch.output_dir / ".claude" / path.name).read_text() == path.read_text()
+
+
+class TestTemplateCache:
+    """Test suite for the on-disk compiled template cache."""
+
+    def test_cache_populated_and_reused(self, make_request, isolated_cache):
+        """Test that compiled templates are stored and reused across instances."""
+        generate_agents.AgentGenerator(verbose=False).generate(make_request("First"))
+        entries = sorted((isolated_cache / "jinja").iterdir())
+        assert entries
+
+        generate_agents.AgentGenerator(verbose=False).generate(make_request("Second"))
+        assert sorted((isolated_cache / "jinja").iterdir()) == entries
+
+    def test_changed_template_gets_new_entry(self, tmp_path, isolated_cache):
+        """Test that the cache key follows template content."""
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        template = templates / "coordinator.template"
+
+        template.write_text("v1 {{ project_name }}")
+        generate_agents.AgentGenerator(templates, verbose=False).warm_up()
+        template.write_text("v2 {{ project_name }}")
+        generate_agents.AgentGenerator(templates, verbose=False).warm_up()
+
+        assert len(list((isolated_cache / "jinja").iterdir())) == 2
+
+    def test_no_cache_and_clear(self, make_request, isolated_cache):
+        """Test disabling and clearing the cache."""
+        generate_agents.AgentGenerator(verbose=False, use_cache=False).generate(make_request())
+        assert not (isolated_cache / "jinja").exists()
+
+        generate_agents.AgentGenerator(verbose=False).generate(make_request())
+        generate_agents.clear_template_cache()
+        assert not list((isolated_cache / "jinja").iterdir())
+
+
+class TestGenerationLock:
+    """Test suite for incremental generation."""
+
+    def test_second_run_skips_unchanged(self, make_request):
+        """Test that unchanged outputs are neither rendered nor written."""
+        request = make_request()
+        generator = generate_agents.AgentGenerator(verbose=False)
+        generator.generate(request)
+        agent_file = request.output_dir / ".claude" / "coordinator.md"
+        mtime = agent_file.stat().st_mtime_ns
+
+        generator.generate(request)
+
+        assert generator.last_summary.regenerated == []
+        assert "coordinator" in generator.last_summary.skipped
+        assert "AGENTS.md" in generator.last_summary.skipped
+        assert agent_file.stat().st_mtime_ns == mtime
+
+    def test_changed_inputs_regenerate(self, make_request):
+        """Test that config changes, deleted outputs and force regenerate."""
+        request = make_request()
+        generator = generate_agents.AgentGenerator(verbose=False)
+        generator.generate(request)
+
+        request.agents[0].config["extra"] = "value"
+        (request.output_dir / ".claude" / "reviewer.md").unlink()
+        generator.generate(request)
+        assert set(generator.last_summary.regenerated) == {request.agents[0].id, "reviewer"}
+
+        generator.generate(request, force=True)
+        assert generator.last_summary.skipped == []
+
+    def test_included_template_change_regenerates(self, make_request, tmp_path):
+        """Test that editing an included file makes its includer stale."""
+        templates = tmp_path / "templates"
+        shutil.copytree(generate_agents.AgentGenerator(verbose=False).templates_dir, templates)
+        (templates / "footer.partial").write_text("v1\n")
+        reviewer = templates / "reviewer.template"
+        reviewer.write_text(reviewer.read_text() + "{% include 'footer.partial' %}\n")
+        request = make_request()
+        generator = generate_agents.AgentGenerator(templates_dir=templates, verbose=False)
+        generator.generate(request)
+
+        (templates / "footer.partial").write_text("v2\n")
+        generator.generate(request)
+
+        assert generator.last_summary.regenerated == ["reviewer"]
+        assert (request.output_dir / ".claude" / "reviewer.md").read_text().endswith("v2")
+
+
+class TestAllFormats:
+    """Test suite for format="all"."""
+
+    def test_all_formats_match_separate_runs(self, make_request):
+        """Test that one pass produces the same files as one run per format."""
+        combined = make_request("Combined")
+        generator = generate_agents.AgentGenerator(verbose=False)
+        generated = generator.generate(combined, format="all")
+
+        agents = [a.id for a in combined.agents]
+        assert len(generated) == len(agents) * len(generate_agents.OUTPUT_FORMATS)
+        assert "qoder:coordinator" in generated
+        assert not any(key.startswith("cursor:") for key in generated)
+        assert not (combined.output_dir / "AGENTS.md").exists()
+
+        separate = make_request("Separate")
+        separate.project_name = "Combined"
+        for fmt in generate_agents.OUTPUT_FORMATS:
+            generator.generate(separate, format=fmt)
+
+        for key, path in generated.items():
+            other = separate.output_dir / path.relative_to(combined.output_dir)
+            assert other.read_text() == path.read_text(), key
+
+    def test_all_formats_render_each_agent_once(self, make_request, monkeypatch):
+        """Test that format-independent templates are rendered once per agent."""
+        request = make_request()
+        generator = generate_agents.AgentGenerator(verbose=False)
+        renders = []
+        original = generate_agents.Template.generate
+        monkeypatch.setattr(
+            generate_agents.Template, "generate",
+            lambda self, *a, **kw: renders.append(self.name) or original(self, *a, **kw)
+        )
+
+        generator.generate(request, format="all")
+
+        agent_templates = [f"{a.template}.template" for a in request.agents]
+        assert sorted(n for n in renders if n in agent_templates) == sorted(agent_templates)
+        assert renders.count("orchestration.template") == 1
+
+
+class TestSharedDefaults:
+    """Test suite for memoized language/framework defaults."""
+
+    def test_defaults_shared_between_agents(self, make_request):
+        """Test that agents with the same stack share one frozen defaults table."""
+        request = make_request()
+        generator = generate_agents.AgentGenerator(verbose=False)
+        first, second = (
+            generator._prepare_context(agent, request, "claude-code")
+            for agent in request.agents[:2]
+        )
+
+        assert first.maps[0] is second.maps[0]
+        assert first["agent_id"] != second["agent_id"]
+        assert first["framework"] == "FastAPI"
+        with pytest.raises(TypeError):
+            first.maps[0]["naming"]["variables"] = "camelCase"
+
+    def test_frozen_values_render_like_plain_ones(self):
+        """Test that frozen lists/dicts keep their plain repr in templates."""
+        frozen = generate_agents._freeze({"params": [{"name": "data"}]})
+
+        assert repr(frozen["params"]) == repr([{"name": "data"}])
+        assert generate_agents._hash_json(frozen) == generate_agents._hash_json(
+            {"params": [{"name": "data"}]}
+        )
+
+
+class TestAtomicWrites:
+    """Test suite for streaming writes."""
+
+    def test_failed_render_keeps_previous_file(self, tmp_path):
+        """Test that an exception mid-stream leaves the old file and no temp files."""
+        target = tmp_path / "agent.md"
+        target.write_text("old")
+
+        def chunks():
+            yield "partial"
+            raise RuntimeError("render failed")
+
+        with pytest.raises(RuntimeError):
+            generate_agents.write_chunks_atomic(target, chunks())
+
+        assert target.read_text() == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["agent.md"]
+
+    def test_written_file_keeps_regular_mode(self, tmp_path):
+        """Test that atomic writes keep the mode of the file they replace."""
+        target = tmp_path / "agent.md"
+        target.write_text("old")
+        target.chmod(0o640)
+
+        generate_agents.write_chunks_atomic(target, iter(["new ", "content"]))
+
+        assert target.read_text() == "new content"
+        assert target.stat().st_mode & 0o777 == 0o640
+
+    def test_new_file_mode_leaves_umask_alone(self, tmp_path, monkeypatch):
+        """Test that new files get write_text permissions without touching the process umask."""
+        reference = tmp_path / "reference.md"
+        reference.write_text("plain")
+        monkeypatch.setattr(generate_agents, "_NEW_FILE_MODE", None)
+        monkeypatch.setattr(generate_agents.os, "umask", lambda mask: pytest.fail("umask changed"))
+
+        generate_agents.write_chunks_atomic(tmp_path / "agent.md", iter(["content"]))
+
+        assert (tmp_path / "agent.md").stat().st_mode == reference.stat().st_mode
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["agent.md", "reference.md"]
+
+
+class TestRenderStats:
+    """Test suite for per-output render profiling."""
+
+    def test_stats_cover_rendered_outputs(self, make_request, tmp_path):
+        """Test that every rendered output gets timings, sizes and a JSON row."""
+        request = make_request()
+        generator = generate_agents.AgentGenerator(verbose=False)
+        generator.generate(request)
+        summary = generator.last_summary
+
+        assert [s.output for s in summary.stats] == summary.regenerated
+        for stats in summary.stats:
+            path = request.output_dir / ".claude" / (
+                "AGENTS.md" if stats.output == "AGENTS.md" else f"{stats.output}.md"
+            )
+            assert stats.bytes == path.stat().st_size
+            assert stats.tokens == len(path.read_text()) // 4
+            assert stats.total_seconds > 0
+
+        report = tmp_path / "stats.json"
+        generate_agents.write_render_stats_json(report, request, summary)
+        data = json.loads(report.read_text())
+        assert len(data["outputs"]) == len(summary.stats)
+        assert data["outputs"][0]["tokens"] == summary.stats[0].tokens
+
+    def test_skipped_outputs_have_no_stats(self, make_request):
+        """Test that unchanged outputs are reported as skipped, not profiled."""
+        request = make_request()
+        generator = generate_agents.AgentGenerator(verbose=False)
+        generator.generate(request)
+        generator.generate(request)
+
+        assert generator.last_summary.stats == []
+
+
+class TestDaemon:
+    """Test suite for the --serve daemon and generate-agents-client.py."""
+
+    def test_round_trip_through_socket(self, tmp_path, monkeypatch):
+        """Test that the client runs a generation in the daemon's warm generator."""
+        socket_path = tmp_path / "agents.sock"
+        daemon = generate_agents.AgentDaemon(socket_path)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        monkeypatch.chdir(tmp_path)
+        try:
+            argv = ["Demo", "cli-tool", "python", "", "project"]
+            first = agents_client.request_daemon(argv, socket_path)
+            second = agents_client.request_daemon(argv, socket_path)
+        finally:
+            daemon.shutdown()
+            daemon.server_close()
+
+        assert first["exit_code"] == 0
+        assert "2 regenerated" in first["stdout"]
+        assert "0 regenerated" in second["stdout"]
+        assert (tmp_path / "project" / ".claude" / "coordinator.md").exists()
+        assert list(daemon.generators) == [(True, None, False)]
+
+    def test_client_reports_missing_daemon(self, tmp_path):
+        """Test that the client signals fallback when nothing listens."""
+        assert agents_client.request_daemon(["Demo", "cli-tool"], tmp_path / "none.sock") is None
+
+    def test_missing_working_directory_is_an_error_response(self, tmp_path):
+        """Test that a vanished client cwd gets an error reply instead of a dropped connection."""
+        daemon = generate_agents.AgentDaemon(tmp_path / "agents.sock")
+        try:
+            response = daemon.execute(["Demo", "cli-tool"], str(tmp_path / "gone"))
+        finally:
+            daemon.server_close()
+
+        assert response["exit_code"] == 2
+        assert "cannot enter working directory" in response["stderr"]
+        assert os.getcwd() != str(tmp_path / "gone")
+
+    def test_client_and_daemon_share_socket_path(self, monkeypatch, tmp_path):
+        """Test that both sides resolve the socket from one helper."""
+        monkeypatch.delenv("CODEFOUNDRY_AGENTS_SOCKET", raising=False)
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+
+        assert agents_client.default_socket_path is generate_agents.default_socket_path
+        assert generate_agents.default_socket_path() == tmp_path / "codefoundry" / "generate-agents.sock"
+
+
+class TestDedupStore:
+    """Test suite for the opt-in content-addressed dedup store."""
+
+    @pytest.fixture
+    def reflinks(self, monkeypatch):
+        """Stand in for FICLONE with a plain copy (same isolation, no shared extents)."""
+        def reflink(source, target):
+            shutil.copyfile(source, target)
+            return True
+        monkeypatch.setattr(generate_agents, "_reflink", reflink)
+
+    def test_identical_outputs_share_store_objects(self, make_request, tmp_path, reflinks):
+        """Test that a second identical project links to existing objects."""
+        store = tmp_path / "store"
+        generator = generate_agents.AgentGenerator(verbose=False, dedup_store=store)
+
+        request = make_request()
+        request.output_dir = tmp_path / "One"
+        generator.generate(request)
+        first = generator.last_summary.dedup
+        request.output_dir = tmp_path / "Two"
+        generator.generate(request)
+        second = generator.last_summary.dedup
+
+        assert first.methods == {"reflink": first.files}
+        assert (second.stored_bytes, second.shared_bytes) == (0, second.logical_bytes)
+        assert second.logical_bytes == first.logical_bytes
+        objects = [p for p in (store / "objects").rglob("*") if p.is_file()]
+        assert len(objects) == first.files
+        one = tmp_path / "One" / ".claude" / "coordinator.md"
+        two = tmp_path / "Two" / ".claude" / "coordinator.md"
+        assert one.read_text() == two.read_text()
+
+    def test_without_reflinks_files_stay_unshared(self, make_request, tmp_path, monkeypatch):
+        """Test that a filesystem without FICLONE gets no store copies and a 1.0x ratio."""
+        monkeypatch.setattr(generate_agents, "_reflink", lambda source, target: False)
+        store = tmp_path / "store"
+        generator = generate_agents.AgentGenerator(verbose=False, dedup_store=store)
+        request = make_request()
+
+        for name in ("One", "Two"):
+            request.output_dir = tmp_path / name
+            generator.generate(request)
+
+        dedup = generator.last_summary.dedup
+        assert dedup.methods == {"unshared": dedup.files}
+        assert (dedup.shared_bytes, dedup.stored_bytes, dedup.ratio) == (0, 0, 1.0)
+        assert not [p for p in store.rglob("*") if p.is_file()]
+
+    def test_regeneration_does_not_touch_shared_copy(self, tmp_path, reflinks):
+        """Test that replacing a linked file leaves other projects intact."""
+        store = generate_agents.ContentStore(tmp_path / "store")
+        first, second = tmp_path / "a.md", tmp_path / "b.md"
+        first.write_text("same")
+        second.write_text("same")
+        store.link(first)
+        store.link(second)
+
+        generate_agents.write_chunks_atomic(second, iter(["changed"]))
+
+        assert first.read_text() == "same"
+        assert second.read_text() == "changed"
+
+    def test_editing_one_project_leaves_others_and_store_intact(self, make_request, tmp_path, reflinks):
+        """Test that an in-place edit never reaches the store or other projects."""
+        store = tmp_path / "store"
+        generator = generate_agents.AgentGenerator(verbose=False, dedup_store=store)
+        request = make_request()
+        for name in ("A", "B"):
+            request.output_dir = tmp_path / name
+            generator.generate(request)
+        original = (tmp_path / "B" / ".claude" / "coordinator.md").read_text()
+
+        with open(tmp_path / "A" / ".claude" / "coordinator.md", "a") as f:
+            f.write("custom prompt\n")
+        request.output_dir = tmp_path / "C"
+        generator.generate(request)
+
+        assert (tmp_path / "B" / ".claude" / "coordinator.md").read_text() == original
+        assert (tmp_path / "C" / ".claude" / "coordinator.md").read_text() == original
+        for path in (store / "objects").rglob("*"):
+            if path.is_file():
+                assert generate_agents._hash_file(path) == path.name
+                assert path.stat().st_mode & 0o777 == 0o444
+
+    def test_corrupted_object_is_replaced(self, tmp_path, reflinks):
+        """Test that an object whose content no longer matches its name is not reused."""
+        store = generate_agents.ContentStore(tmp_path / "store")
+        first, second = tmp_path / "a.md", tmp_path / "b.md"
+        first.write_text("same")
+        second.write_text("same")
+        store.link(first)
+        object_path = store._object_path(generate_agents._hash_file(first))
+        os.chmod(object_path, 0o644)
+        object_path.write_text("tampered")
+
+        store.link(second)
+
+        assert second.read_text() == "same"
+        assert object_path.read_text() == "same"
+        assert object_path.stat().st_mode & 0o777 == 0o444
+
+    def test_hardlinks_are_opt_in_and_read_only(self, tmp_path):
+        """Test that hardlink mode shares one read-only inode, counted once on disk."""
+        store = generate_agents.ContentStore(tmp_path / "store", hardlinks=True)
+        first, second = tmp_path / "a.md", tmp_path / "b.md"
+        first.write_text("same")
+        second.write_text("same")
+
+        assert store.link(first) == ("hardlink", 4, 4)
+        assert store.link(second) == ("hardlink", 4, 0)
+
+        assert os.path.samefile(first, second)
+        assert second.stat().st_mode & 0o777 == 0o444
+
+    def test_regenerated_hardlink_gets_regular_mode(self, tmp_path):
+        """Test that rewriting a hardlinked output does not inherit the store's 0444."""
+        store = generate_agents.ContentStore(tmp_path / "store", hardlinks=True)
+        target, reference = tmp_path / "a.md", tmp_path / "reference.md"
+        target.write_text("same")
+        reference.write_text("plain")
+        store.link(target)
+
+        generate_agents.write_chunks_atomic(target, iter(["changed"]))
+
+        assert target.stat().st_mode == reference.stat().st_mode
+        assert target.stat().st_nlink == 1
+
+
+class TestAgentsConfigCache:
+    """Test suite for cached agents.yaml parsing."""
+
+    @pytest.fixture
+    def config_path(self, tmp_path):
+        path = tmp_path / "agents.yaml"
+        data = generate_agents.create_default_config("web-service")
+        path.write_text(generate_agents.yaml.dump(data, Dumper=generate_agents.YAML_DUMPER))
+        generate_agents.clear_agents_config_cache()
+        return path
+
+    def test_unchanged_file_skips_yaml_parsing(self, config_path, monkeypatch):
+        """Test that memory and disk hits never call the YAML loader."""
+        first = generate_agents.load_agents_config(config_path)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("YAML parsed again")
+
+        monkeypatch.setattr(generate_agents.yaml, "load", fail)
+        assert generate_agents.load_agents_config(config_path) == first
+
+        generate_agents._agents_config_cache.clear()
+        assert generate_agents.load_agents_config(config_path) == first
+
+    def test_edited_file_is_reparsed(self, config_path):
+        """Test that a content change invalidates the cached agents."""
+        generate_agents.load_agents_config(config_path)
+        config_path.write_text(config_path.read_text().replace("Coordinator", "Lead"))
+
+        agents = generate_agents.load_agents_config(config_path)
+
+        assert agents[0].name == "Lead"
+
+    def test_callers_get_independent_copies(self, config_path):
+        """Test that mutating a returned config does not poison the cache."""
+        generate_agents.load_agents_config(config_path)[0].config["x"] = 1
+
+        assert generate_agents.load_agents_config(config_path)[0].config == {}
+
+
+class TestMonorepoScan:
+    """Test suite for monorepo package discovery."""
+
+    @pytest.fixture
+    def monorepo(self, tmp_path):
+        layout = {
+            "package.json": "",
+            "services/api/pyproject.toml": "",
+            "services/web/package.json": "",
+            "services/web/tsconfig.json": "",
+            "tools/cli/go.mod": "",
+            "services/web/node_modules/dep/package.json": "",
+            ".git/hooks/go.mod": "",
+        }
+        for relative, content in layout.items():
+            path = tmp_path / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+        return tmp_path
+
+    def test_detects_packages_and_prunes(self, monorepo):
+        """Test marker detection, pruning and dropping the workspace root."""
+        packages = generate_agents.scan_monorepo(monorepo, workers=2)
+
+        found = {str(p.path.relative_to(monorepo)): p.language for p in packages}
+        assert found == {
+            "services/api": "python",
+            "services/web": "typescript",
+            "tools/cli": "go",
+        }
+
+    def test_generates_agents_per_package(self, monorepo):
+        """Test that each shard gets agents in its own language."""
+        packages = generate_agents.scan_monorepo(monorepo)
+        requests = generate_agents.monorepo_requests(packages, "cli-tool")
+
+        results = generate_agents.generate_batch(requests, jobs=2)
+
+        assert all(r.error is None for r in results)
+        coordinator = monorepo / "tools" / "cli" / ".claude" / "coordinator.md"
+        assert coordinator.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
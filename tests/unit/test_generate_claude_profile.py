@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Unit tests for generate-claude-profile.py
+
+Tests the profile generator for:
+- Layer resolution (base -> shared -> overlay) into one output map
+- Render-once output writing
+- Precompiled per-archetype bundles
+- Parallel rendering with deterministic warnings
+- Variable-aware render cache
+- In-memory output tree and single commit pass
+- Archetype matrix generation
+- Include dependency graph (--affected-by)
+- Fleet regeneration from profile metadata with a resumable checkpoint
+- Render-time token accounting and budgets
+"""
+
+import argparse
+import importlib.util
+import json
+import shutil
+import sys
+import pytest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[2] / "scripts"
+TEMPLATE_DIR = SCRIPTS_DIR.parent / "templates" / "claude-profile"
+
+
+def _load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, SCRIPTS_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+profile = _load_module("generate_claude_profile", "generate-claude-profile.py")
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep profile bundles inside the test's tmp_path."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("CODEFOUNDRY_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
+def run_main(monkeypatch, project_dir, archetype="web-service", *extra):
+    """Run main() with CLI arguments."""
+    monkeypatch.setattr(sys, "argv", [
+        "generate-claude-profile.py",
+        "--archetype", archetype,
+        "--project-name", "demo",
+        "--project-dir", str(project_dir),
+        "--template-dir", str(TEMPLATE_DIR),
+        *extra,
+    ])
+    profile.main()
+
+
+class TestResolveOutputs:
+    """Test suite for layer resolution."""
+
+    @pytest.fixture
+    def layers(self):
+        return [
+            ("base", TEMPLATE_DIR / "base"),
+            ("shared", TEMPLATE_DIR / "shared"),
+            ("overlay", TEMPLATE_DIR / "overlays" / "web-service"),
+        ]
+
+    def test_upper_layer_wins(self, layers):
+        """Test that overlay templates replace shared ones in the map."""
+        outputs = profile.resolve_outputs(
+            layers, profile.SUBDIRS,
+            {"agents": ["coordinator", "devops"], "skills": [], "commands": []},
+        )
+
+        assert outputs["CLAUDE.md"] == ("CLAUDE.md.j2", "base")
+        assert outputs[".claude/settings.json"] == ("settings.json.j2", "base")
+        assert outputs[".claude/agents/devops.md"] == ("agents/devops.md.j2", "overlay")
+        assert outputs[".claude/hooks/pre-commit.sh"][1] == "base"
+
+    def test_unlisted_components_are_not_rendered(self, layers):
+        """Test that agents/skills/commands outside the merged lists are dropped."""
+        outputs = profile.resolve_outputs(
+            layers, profile.SUBDIRS,
+            {"agents": ["coordinator"], "skills": ["validate"], "commands": []},
+        )
+
+        agents = [k for k in outputs if k.startswith(".claude/agents/")]
+        assert agents == [".claude/agents/coordinator.md"]
+        assert ".claude/skills/api-development.md" not in outputs
+        assert ".claude/commands/health.md" not in outputs
+
+
+class TestRenderOnce:
+    """Test suite for end-to-end generation."""
+
+    def test_each_output_rendered_once(self, tmp_path, monkeypatch):
+        """Test that no template is rendered more than once per run."""
+        rendered = []
+        original = profile.Environment.get_template
+
+        def counting(env, name, *args, **kwargs):
+            rendered.append(name)
+            return original(env, name, *args, **kwargs)
+
+        monkeypatch.setattr(profile.Environment, "get_template", counting)
+        run_main(monkeypatch, tmp_path / "demo")
+
+        assert len(rendered) == len(set(rendered))
+        assert (tmp_path / "demo" / "CLAUDE.md").exists()
+        assert (tmp_path / "demo" / ".claude" / "agents" / "devops.md").exists()
+        assert "agents/tester.md.j2" in rendered
+
+    def test_stale_components_are_removed(self, tmp_path, monkeypatch):
+        """Test that files from an earlier archetype are cleaned up."""
+        project_dir = tmp_path / "demo"
+        run_main(monkeypatch, project_dir, "web-service")
+        run_main(monkeypatch, project_dir, "cli-tool")
+
+        agents_dir = project_dir / ".claude" / "agents"
+        assert not (agents_dir / "devops.md").exists()
+        assert (agents_dir / "coordinator.md").exists()
+
+    def test_rerun_writes_nothing_and_registry_uses_renders(self, tmp_path, monkeypatch, capsys):
+        """Test the single commit pass: unchanged files untouched, AGENTS.md filled."""
+        project_dir = tmp_path / "demo"
+        run_main(monkeypatch, project_dir)
+        claude_dir = project_dir / ".claude"
+        before = {p: p.stat().st_mtime_ns for p in claude_dir.rglob("*") if p.is_file()}
+        hook = claude_dir / "hooks" / "pre-commit.sh"
+        hook_ctime = hook.stat().st_ctime_ns
+        capsys.readouterr()
+
+        run_main(monkeypatch, project_dir)
+
+        assert "(0 written, " in capsys.readouterr().out
+        assert {p: p.stat().st_mtime_ns for p in before} == before
+        assert hook.stat().st_ctime_ns == hook_ctime
+        registry = (claude_dir / "AGENTS.md").read_text()
+        assert "| devops | `agents/devops.md` | " in registry
+        assert "| devops | `agents/devops.md` |  |" not in registry
+
+    def test_same_size_edit_is_rewritten(self, tmp_path, monkeypatch, capsys):
+        """Test that the hash check catches edits that keep the file size."""
+        project_dir = tmp_path / "demo"
+        run_main(monkeypatch, project_dir)
+        claude_md = project_dir / "CLAUDE.md"
+        original = claude_md.read_bytes()
+        claude_md.write_bytes(original.swapcase())
+        (project_dir / ".claude" / "skills" / "stale.md").write_text("old")
+        capsys.readouterr()
+
+        run_main(monkeypatch, project_dir)
+
+        assert claude_md.read_bytes() == original
+        summary = capsys.readouterr().out
+        assert "(1 written, " in summary
+        assert ", 1 removed)" in summary
+        assert not (project_dir / ".claude" / "skills" / "stale.md").exists()
+
+
+class TestBundles:
+    """Test suite for precompiled profile bundles."""
+
+    @pytest.fixture
+    def template_dir(self, tmp_path):
+        copy = tmp_path / "templates"
+        shutil.copytree(TEMPLATE_DIR, copy)
+        return copy
+
+    def test_fresh_bundle_matches_source_output(self, template_dir, tmp_path):
+        """Test that a bundle renders the same files as the templates."""
+        bundle_dir = tmp_path / "bundles"
+        profile.build_bundle(template_dir, "web-service", bundle_dir)
+        layers = profile.profile_layers(template_dir, "web-service")
+
+        env, meta = profile.load_bundle(bundle_dir, "web-service", layers)
+        source_env = profile.create_environment(layers)
+
+        assert meta["outputs"][".claude/agents/devops.md"] == ("agents/devops.md.j2", "overlay")
+        variables = {"project_name": "demo", "agents": ["devops"], "skills": [], "commands": []}
+        for name, _ in meta["outputs"].values():
+            assert (env.get_template(name).render(**variables)
+                    == source_env.get_template(name).render(**variables))
+
+    def test_edited_template_makes_bundle_stale(self, template_dir, tmp_path, capsys):
+        """Test fallback to source when a template changes after the build."""
+        bundle_dir = tmp_path / "bundles"
+        profile.build_bundle(template_dir, "cli-tool", bundle_dir)
+        (template_dir / "base" / "CLAUDE.md.j2").write_text("changed\n")
+
+        layers = profile.profile_layers(template_dir, "cli-tool")
+
+        assert profile.load_bundle(bundle_dir, "cli-tool", layers) is None
+        assert "stale" in capsys.readouterr().err
+
+
+class TestParallelRender:
+    """Test suite for --jobs rendering."""
+
+    def test_parallel_output_and_warnings_match_sequential(self, tmp_path, capsys):
+        """Test that a thread pool writes the same files and warns in map order."""
+        template_dir = tmp_path / "templates"
+        for name in ("a", "b", "c", "d"):
+            body = "{{ missing() }}" if name in ("b", "d") else f"{name}: {{{{ project_name }}}}"
+            path = template_dir / "agents" / f"{name}.md.j2"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(body)
+        layers = [("base", template_dir)]
+        env = profile.create_environment(layers)
+        outputs = profile.resolve_outputs(layers, ["agents"], {})
+
+        results = {}
+        for jobs in (1, 4):
+            project_dir = tmp_path / f"jobs{jobs}"
+            tree = profile.render_tree(env, outputs, {"project_name": "demo"}, jobs=jobs)
+            profile.commit_tree(project_dir, tree, [], jobs=jobs)
+            files = sorted(p.name for p in (project_dir / ".claude" / "agents").iterdir())
+            results[jobs] = (files, capsys.readouterr().err)
+
+        assert results[1] == results[4]
+        assert results[4][0] == ["a.md", "c.md"]
+        warnings = results[4][1].splitlines()
+        assert [w.split()[4].rstrip(":") for w in warnings] == ["agents/b.md.j2", "agents/d.md.j2"]
+
+
+class TestRenderCache:
+    """Test suite for the variable-aware render cache."""
+
+    @pytest.fixture
+    def env(self, tmp_path):
+        template_dir = tmp_path / "templates"
+        template_dir.mkdir()
+        (template_dir / "named.md.j2").write_text("# {{ project_name }}\n")
+        (template_dir / "static.md.j2").write_text("{% include 'part.j2' %} {{ language }}\n")
+        (template_dir / "part.j2").write_text("{{ archetype }}")
+        return profile.create_environment([("base", template_dir)])
+
+    def test_dependencies_include_referenced_templates(self, env):
+        """Test that variables of included templates are part of the key."""
+        cache = profile.RenderCache(None)
+
+        assert cache.dependencies(env, "named.md.j2")[1] == ["project_name"]
+        assert cache.dependencies(env, "static.md.j2")[1] == ["archetype", "language"]
+
+    def test_only_used_variables_invalidate(self, env, tmp_path):
+        """Test that a new project_name reuses templates that do not mention it."""
+        cache = profile.RenderCache(tmp_path / "renders")
+        base = {"project_name": "one", "language": "python", "archetype": "cli-tool"}
+
+        for name in ("named.md.j2", "static.md.j2"):
+            cache.render(env, name, base)
+        renamed = dict(base, project_name="two")
+        named = cache.render(env, "named.md.j2", renamed)
+        static = cache.render(env, "static.md.j2", renamed)
+
+        assert named == "# two\n"
+        assert static == "cli-tool python\n"
+        assert (cache.hits, cache.misses) == (1, 3)
+
+    def test_environment_options_are_part_of_the_key(self, env, tmp_path):
+        """Test that changing an Environment option does not serve the old render."""
+        variables = {"project_name": "one"}
+        profile.RenderCache(tmp_path / "renders").render(env, "named.md.j2", variables)
+        stripped = env.overlay(keep_trailing_newline=False)
+        cache = profile.RenderCache(tmp_path / "renders")
+
+        assert cache.render(stripped, "named.md.j2", variables) == "# one"
+        assert (cache.hits, cache.misses) == (0, 1)
+
+    def test_cache_is_pruned_least_recently_used_first(self, env, tmp_path):
+        """Test that the directory stays under its size cap, keeping recently used renders."""
+        cache = profile.RenderCache(tmp_path / "renders", max_bytes=400)
+        for index in range(40):
+            cache.render(env, "named.md.j2", {"project_name": f"project-{index:02}"})
+
+        files = [p for p in (tmp_path / "renders").rglob("*") if p.is_file()]
+        assert sum(p.stat().st_size for p in files) <= 400
+        fresh = profile.RenderCache(tmp_path / "renders", max_bytes=400)
+        fresh.render(env, "named.md.j2", {"project_name": "project-39"})
+        assert fresh.hits == 1
+
+
+class TestArchetypeMatrix:
+    """Test suite for --all-archetypes."""
+
+    def test_matrix_matches_single_runs_and_shares_renders(self, tmp_path, monkeypatch):
+        """Test that the matrix equals per-archetype runs and reuses base renders."""
+        args = argparse.Namespace(project_name=None, project_description=None,
+                                  language=None, jobs=4, token_budget=None,
+                                  strict_budgets=False)
+        cache = profile.RenderCache(None)
+
+        code = profile.generate_matrix(args, TEMPLATE_DIR, tmp_path / "matrix", None, cache)
+
+        assert code == 0
+        assert cache.hits > 0
+        archetypes = profile.load_manifest(TEMPLATE_DIR / "overlays")["archetypes"]
+        assert sorted(p.name for p in (tmp_path / "matrix").iterdir()) == sorted(archetypes)
+
+        monkeypatch.setattr(sys, "argv", [
+            "generate-claude-profile.py", "--archetype", "fullstack",
+            "--project-name", profile.MATRIX_PROJECT_NAME,
+            "--project-dir", str(tmp_path / "single"), "--template-dir", str(TEMPLATE_DIR),
+        ])
+        profile.main()
+        matrix = tmp_path / "matrix" / "fullstack"
+        for path in (tmp_path / "single").rglob("*"):
+            if path.is_file():
+                relative = path.relative_to(tmp_path / "single")
+                assert (matrix / relative).read_bytes() == path.read_bytes()
+
+
+class TestAffectedBy:
+    """Test suite for include-graph invalidation."""
+
+    @pytest.fixture
+    def template_dir(self, tmp_path):
+        copy = tmp_path / "templates"
+        shutil.copytree(TEMPLATE_DIR, copy)
+        partial = copy / "base" / "partials" / "footer.md.j2"
+        partial.parent.mkdir()
+        partial.write_text("Generated for {{ project_name }}\n")
+        reviewer = copy / "base" / "agents" / "reviewer.md.j2"
+        reviewer.write_text(reviewer.read_text() + "{% include 'partials/footer.md.j2' %}\n")
+        return copy
+
+    def test_partial_affects_only_its_includers(self, template_dir, tmp_path):
+        """Test that editing a partial selects the outputs that include it."""
+        cache = profile.RenderCache(tmp_path / "renders")
+        partial = template_dir / "base" / "partials" / "footer.md.j2"
+
+        affected = profile.affected_outputs(
+            template_dir, ["web-service", "cli-tool"], [str(partial)], cache)
+
+        assert set(affected) == {"web-service", "cli-tool"}
+        assert list(affected["web-service"]) == [".claude/agents/reviewer.md"]
+
+    def test_manifest_change_affects_whole_archetype(self, template_dir, tmp_path):
+        """Test that an overlay manifest invalidates every output of that archetype only."""
+        cache = profile.RenderCache(None)
+        manifest = template_dir / "overlays" / "cli-tool" / "manifest.json"
+
+        affected = profile.affected_outputs(
+            template_dir, ["web-service", "cli-tool"], [str(manifest)], cache)
+
+        assert list(affected) == ["cli-tool"]
+        assert "CLAUDE.md" in affected["cli-tool"]
+
+    def test_project_dir_alone_uses_profile_metadata(self, template_dir, tmp_path, monkeypatch, capsys):
+        """Test that --project-dir without --archetype regenerates from .claude/profile.json."""
+        project = tmp_path / "project"
+        base_argv = ["generate-claude-profile.py", "--project-dir", str(project),
+                     "--template-dir", str(template_dir), "--no-bundle"]
+        monkeypatch.setattr(sys, "argv", base_argv + ["--archetype", "cli-tool", "--project-name", "demo"])
+        profile.main()
+        partial = template_dir / "base" / "partials" / "footer.md.j2"
+        partial.write_text("Regenerated for {{ project_name }}\n")
+
+        monkeypatch.setattr(sys, "argv", base_argv + ["--affected-by", str(partial)])
+        profile.main()
+
+        assert "Regenerated for demo" in (project / ".claude" / "agents" / "reviewer.md").read_text()
+        assert "cli-tool: 1 output(s)" in capsys.readouterr().out
+
+    def test_project_dir_without_profile_is_an_error(self, template_dir, tmp_path, monkeypatch):
+        """Test that a project without metadata needs an explicit --archetype."""
+        monkeypatch.setattr(sys, "argv", [
+            "generate-claude-profile.py", "--project-dir", str(tmp_path / "empty"),
+            "--template-dir", str(template_dir), "--affected-by", str(template_dir / "base"),
+        ])
+
+        with pytest.raises(SystemExit) as exit_info:
+            profile.main()
+
+        assert "pass --archetype" in str(exit_info.value.code)
+
+
+class TestFleet:
+    """Test suite for --fleet regeneration."""
+
+    def run_fleet(self, monkeypatch, *extra):
+        monkeypatch.setattr(sys, "argv", [
+            "generate-claude-profile.py", "--template-dir", str(TEMPLATE_DIR), "--fleet", *extra,
+        ])
+        with pytest.raises(SystemExit) as exit_info:
+            profile.main()
+        return exit_info.value.code
+
+    def test_legacy_profile_metadata_from_settings(self, tmp_path, monkeypatch):
+        """Test that profiles without profile.json are read back from settings.json."""
+        run_main(monkeypatch, tmp_path, "web-service", "--language", "go")
+        (tmp_path / ".claude" / "profile.json").unlink()
+
+        metadata = profile.read_profile_metadata(tmp_path)
+
+        assert metadata["archetype"] == "web-service"
+        assert metadata["project_name"] == "demo"
+        assert metadata["language"] == "go"
+        assert profile.read_profile_metadata(tmp_path / "missing") is None
+
+    def test_fleet_regenerates_and_resumes(self, tmp_path, monkeypatch, capsys):
+        """Test that a fleet run restores edited outputs and a rerun skips checkpointed projects."""
+        projects = tmp_path / "projects"
+        for archetype in ("web-service", "cli-tool"):
+            run_main(monkeypatch, projects / archetype, archetype)
+        (projects / "unprofiled").mkdir()
+        claude_md = projects / "cli-tool" / "CLAUDE.md"
+        expected = claude_md.read_text()
+        claude_md.write_text("edited\n")
+        checkpoint = tmp_path / "fleet.jsonl"
+        capsys.readouterr()
+
+        assert self.run_fleet(monkeypatch, str(projects / "*"), "--checkpoint", str(checkpoint),
+                              "--jobs", "2") == 0
+        out = capsys.readouterr().out
+        assert claude_md.read_text() == expected
+        assert "unprofiled: SKIPPED" in out
+        assert "2 ok, 0 failed, 1 without profile" in out
+
+        assert self.run_fleet(monkeypatch, str(projects / "*"), "--checkpoint", str(checkpoint)) == 0
+        assert "1 to generate, 2 already done" in capsys.readouterr().out
+
+
+class TestTokenBudget:
+    """Test suite for render-time token accounting."""
+
+    def test_report_matches_written_files(self, tmp_path, monkeypatch):
+        """Test that report counts equal characters / 4 of the written markdown."""
+        run_main(monkeypatch, tmp_path)
+
+        report = json.loads((tmp_path / profile.TOKEN_REPORT).read_text())
+
+        for out_rel, entry in report["files"].items():
+            assert entry["chars"] == len((tmp_path / out_rel).read_text())
+        assert report["components"]["agents"]["coordinator"] == \
+            report["files"][".claude/agents/coordinator.md"]["tokens"]
+        assert report["violations"] == []
+
+    def test_strict_budget_fails_over_budget_agent(self, tmp_path, monkeypatch, capsys):
+        """Test that --strict-budgets exits 1 and names the oversized component."""
+        with pytest.raises(SystemExit) as exit_info:
+            run_main(monkeypatch, tmp_path, "web-service",
+                     "--token-budget", "agent=100", "--strict-budgets")
+
+        assert exit_info.value.code == 1
+        assert "agent 'coordinator' is ~" in capsys.readouterr().err
+        report = json.loads((tmp_path / profile.TOKEN_REPORT).read_text())
+        assert {v["status"] for v in report["violations"]} == {"over"}
+
+    @pytest.mark.parametrize("budget", [0, "800", 1.5])
+    def test_invalid_manifest_budget_is_reported(self, tmp_path, monkeypatch, budget):
+        """Test that manifest budgets must be positive integers."""
+        templates = tmp_path / "templates"
+        shutil.copytree(TEMPLATE_DIR, templates)
+        manifest_path = templates / "overlays" / "web-service" / "manifest.json"
+        manifest = json.loads(manifest_path.read_text())
+        manifest["token_budgets"] = {"agent": budget}
+        manifest_path.write_text(json.dumps(manifest))
+        monkeypatch.setattr(sys, "argv", [
+            "generate-claude-profile.py", "--archetype", "web-service", "--project-name", "demo",
+            "--project-dir", str(tmp_path / "out"), "--template-dir", str(templates), "--no-bundle",
+        ])
+
+        with pytest.raises(SystemExit) as exit_info:
+            profile.main()
+
+        assert "token budget 'agent' must be a positive integer" in str(exit_info.value.code)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])